@@ -6,35 +6,241 @@
 提供区块链API接口和Web前端
 """
 
-from flask import Flask, jsonify, request, render_template, redirect, url_for
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    request,
+    render_template,
+    redirect,
+    url_for,
+)
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import json
+import orjson
+import numpy as np
 import time
 import os
+import hashlib
+import threading
+import secrets
 
 # 导入量子区块链实现
-from quantum_blockchain import QuantumBlockchain, QuantumRandom, QuantumHash, Block
+from quantum_blockchain import QuantumBlockchain, QuantumHash, Block
+
+
+class OrjsonProvider(JSONProvider):
+    """使用orjson作为Flask的JSON序列化后端"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # jsonify直接使用orjson输出的字节作为响应体，不经过str解码再编码
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+            mimetype="application/json",
+        )
+
 
 # 初始化Flask应用
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)  # 启用跨域请求支持
 
 # 全局区块链实例
 blockchain = None
 
-# 数据文件路径
-BLOCKCHAIN_FILE = "quantum_blockchain.json"
+# 数据文件路径（追加式日志，每行一个区块）
+BLOCKCHAIN_FILE = "quantum_blockchain.jsonl"
+
+# 旧版JSON数组格式的数据文件，仅在首次启动时迁移
+LEGACY_BLOCKCHAIN_FILE = "quantum_blockchain.json"
+
+# 文件读写缓冲区大小（64KB）
+FILE_BUFFER_SIZE = 64 * 1024
+
+# 日志文件的追加句柄
+_journal = None
+
+# 写锁：保证多线程下新区块按顺序链接到链尾并写入日志
+_chain_lock = threading.Lock()
+
+# 区块视图缓存：区块索引 -> 序列化后的区块详情JSON（区块上链后不再变化）
+_block_view_cache: dict[int, bytes] = {}
+
+# 区块详情的ETag缓存：区块索引 -> 序列化结果的摘要
+_block_etag_cache: dict[int, str] = {}
+
+# 区块哈希前缀索引：哈希前8位 -> 区块索引列表
+HASH_PREFIX_LEN = 8
+_hash_prefix_index: dict[str, list[int]] = {}
+
+# 全部交易的API视图（附带所在区块信息）及其序列化结果，随区块入链追加
+_all_transactions: list[dict] = []
+_all_transactions_json: list[bytes] = []
+
+# 交易搜索文本：与_all_transactions一一对应的小写交易JSON（json.dumps的默认格式）
+_tx_search_entries: list[str] = []
+
+
+class BlockMetadata:
+    """区块元数据的列式存储（每个字段一个数组），供/api/blocks批量读取"""
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.index = np.empty(capacity, dtype=np.int64)
+        self.timestamp = np.empty(capacity, dtype=np.float64)
+        self.tx_count = np.empty(capacity, dtype=np.int64)
+        # 字符串列使用object数组，保存原字符串对象，不按定长截断
+        self.hash = np.empty(capacity, dtype=object)
+        self.timestamp_human = np.empty(capacity, dtype=object)
+
+    def append(self, block):
+        """追加一个区块的元数据，容量不足时倍增"""
+        if self.size == len(self.index):
+            self._grow()
+        i = self.size
+        self.index[i] = block.index
+        self.timestamp[i] = block.timestamp
+        self.tx_count[i] = len(block.tx_list)
+        self.hash[i] = block.hash
+        self.timestamp_human[i] = block.timestamp_human
+        self.size += 1
+
+    def _grow(self):
+        capacity = len(self.index) * 2
+        for name in ("index", "timestamp", "tx_count", "hash", "timestamp_human"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[: self.size] = column[: self.size]
+            setattr(self, name, grown)
+
+    def clear(self):
+        self.size = 0
+
+    def rows(self):
+        """返回全部区块的(索引, 时间戳, 可读时间, 交易数, 哈希)元组"""
+        window = slice(0, self.size)
+        return zip(
+            self.index[window].tolist(),
+            self.timestamp[window].tolist(),
+            self.timestamp_human[window].tolist(),
+            self.tx_count[window].tolist(),
+            self.hash[window].tolist(),
+        )
+
+
+# 区块元数据，随区块入链追加
+_block_metadata = BlockMetadata()
+
+
+def canonical_json(obj) -> str:
+    """将对象序列化为键有序的紧凑JSON字符串，用作哈希输入"""
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS).decode()
+
+
+def random_bits(num_bits: int) -> str:
+    """生成指定长度的随机二进制字符串（区块签名、密钥等字段使用）"""
+    return format(secrets.randbits(num_bits), f"0{num_bits}b")
+
+
+def block_view(block):
+    """区块详情的API视图"""
+    return {
+        "index": block.index,
+        "timestamp": block.timestamp,
+        "timestamp_human": block.timestamp_human,
+        "data": block.data,
+        "previous_hash": block.previous_hash,
+        "hash": block.hash,
+        "quantum_signature": block.quantum_signature,
+    }
+
+
+def block_view_bytes(block) -> bytes:
+    """获取区块详情的序列化结果，首次访问时写入缓存"""
+    view = _block_view_cache.get(block.index)
+    if view is None:
+        view = _block_view_cache[block.index] = orjson.dumps(block_view(block))
+    return view
+
+
+def block_etag(block) -> str:
+    """获取区块详情的ETag"""
+    etag = _block_etag_cache.get(block.index)
+    if etag is None:
+        digest = hashlib.blake2b(block_view_bytes(block), digest_size=8)
+        etag = _block_etag_cache[block.index] = digest.hexdigest()
+    return etag
+
+
+def block_response(block) -> Response:
+    """返回区块详情，客户端缓存的ETag仍然有效时返回304"""
+    response = json_response(block_view_bytes(block))
+    response.set_etag(block_etag(block))
+    response.last_modified = block.timestamp
+    return response.make_conditional(request)
+
+
+def json_response(body: bytes) -> Response:
+    """直接返回已序列化的JSON字节"""
+    return Response(body, mimetype="application/json")
+
+
+def index_block(block):
+    """登记新区块的元数据、哈希前缀和交易视图"""
+    _block_metadata.append(block)
+    _hash_prefix_index.setdefault(block.hash[:HASH_PREFIX_LEN], []).append(block.index)
+
+    for tx in block.tx_list:
+        tx_view = tx.copy()
+        tx_view["block_index"] = block.index
+        tx_view["block_hash"] = block.hash
+        tx_view["timestamp_human"] = time.ctime(tx.get("timestamp", 0))
+        _all_transactions.append(tx_view)
+        _all_transactions_json.append(orjson.dumps(tx_view))
+        _tx_search_entries.append(json.dumps(tx, ensure_ascii=False).lower())
+
+
+def find_blocks(query):
+    """按区块索引或哈希前缀查找区块，返回有序的区块索引列表"""
+    chain = blockchain.chain
+    found = set()
+
+    if query.isdigit() and str(int(query)) == query and int(query) < len(chain):
+        found.add(int(query))
+
+    if len(query) >= HASH_PREFIX_LEN:
+        candidates = _hash_prefix_index.get(query[:HASH_PREFIX_LEN], [])
+    else:
+        candidates = range(len(chain))
+    found.update(i for i in candidates if chain[i].hash.startswith(query))
+
+    return sorted(found)
 
 
 # 初始化或加载区块链
 def initialize_blockchain():
     global blockchain
 
+    _block_view_cache.clear()
+    _block_etag_cache.clear()
+    _hash_prefix_index.clear()
+    _block_metadata.clear()
+    _all_transactions.clear()
+    _all_transactions_json.clear()
+    _tx_search_entries.clear()
+
     # 如果存在保存的区块链，则加载它
-    if os.path.exists(BLOCKCHAIN_FILE):
+    if os.path.exists(BLOCKCHAIN_FILE) or os.path.exists(LEGACY_BLOCKCHAIN_FILE):
         try:
-            with open(BLOCKCHAIN_FILE, "r", encoding="utf-8") as f:
-                blockchain_data = json.load(f)
+            blockchain_data, needs_rewrite = load_blockchain_data()
 
             # 创建新的区块链实例
             blockchain = QuantumBlockchain()
@@ -54,7 +260,14 @@ def initialize_blockchain():
                 block.hash = block_data["hash"]
                 blockchain.chain.append(block)
 
+            # 旧版文件或日志末尾存在残缺行时，重写为完整的日志文件
+            if needs_rewrite:
+                save_blockchain()
+
             print(f"已加载保存的区块链，共{len(blockchain.chain)}个区块")
+        except JournalCorruptedError:
+            # 日志中间有损坏的记录：不能用新链覆盖，交由人工处理
+            raise
         except Exception as e:
             print(f"加载区块链出错: {e}")
             blockchain = QuantumBlockchain()  # 出错时创建新区块链
@@ -79,10 +292,12 @@ def initialize_blockchain():
                     "timestamp": time.time(),
                 },
             ],
-            "merkle_root": QuantumHash.quantum_hash(json.dumps({"genesis": "block"})),
-            "quantum_signature": QuantumRandom.generate_random_bits(64),
-            "nonce": int(QuantumRandom.generate_random_bits(32), 2),
-            "quantum_key": QuantumRandom.generate_random_bits(4),
+            "merkle_root": QuantumHash.quantum_hash(
+                canonical_json({"genesis": "block"})
+            ),
+            "quantum_signature": random_bits(64),
+            "nonce": secrets.randbits(32),
+            "quantum_key": random_bits(4),
             "token": {
                 "name": "量子币",
                 "symbol": "QTC",
@@ -100,30 +315,114 @@ def initialize_blockchain():
 
         print("已创建新的区块链并初始化创世区块")
 
+    for block in blockchain.chain:
+        index_block(block)
+
     return blockchain
 
 
-# 保存区块链到文件
-def save_blockchain():
+def block_to_dict(block):
+    """将区块转换为持久化使用的字典"""
+    return {
+        "index": block.index,
+        "timestamp": block.timestamp,
+        "data": block.data,
+        "previous_hash": block.previous_hash,
+        "hash": block.hash,
+        "quantum_signature": block.quantum_signature,
+    }
+
+
+class JournalCorruptedError(ValueError):
+    """区块日志中间存在无法解析的记录"""
+
+
+# 从文件读取区块数据，同时返回日志是否需要重写
+def load_blockchain_data():
+    if not os.path.exists(BLOCKCHAIN_FILE):
+        # 兼容旧版的JSON数组格式
+        with open(LEGACY_BLOCKCHAIN_FILE, "rb", buffering=FILE_BUFFER_SIZE) as f:
+            return orjson.loads(f.read()), True
+
     blockchain_data = []
+    bad_line = None
+    with open(BLOCKCHAIN_FILE, "rb", buffering=FILE_BUFFER_SIZE) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            if bad_line is not None:
+                # 损坏的记录之后还有内容，说明不是写入中途退出留下的残缺末行
+                raise JournalCorruptedError(
+                    f"日志 {BLOCKCHAIN_FILE} 第{bad_line}行的区块记录已损坏"
+                )
+            try:
+                blockchain_data.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                bad_line = line_number
 
-    for block in blockchain.chain:
-        block_data = {
-            "index": block.index,
-            "timestamp": block.timestamp,
-            "data": block.data,
-            "previous_hash": block.previous_hash,
-            "hash": block.hash,
-            "quantum_signature": block.quantum_signature,
-        }
-        blockchain_data.append(block_data)
+    if bad_line is not None:
+        # 进程在写入中途退出时，最后一行可能不完整
+        print(f"日志 {BLOCKCHAIN_FILE} 末尾存在不完整的区块记录，已忽略")
+        return blockchain_data, True
+    return blockchain_data, False
+
+
+# 保存区块链到文件（完整重写日志）
+def save_blockchain():
+    global _journal
+
+    if _journal is not None:
+        _journal.close()
+        _journal = None
 
-    with open(BLOCKCHAIN_FILE, "w", encoding="utf-8") as f:
-        json.dump(blockchain_data, f, ensure_ascii=False, indent=2)
+    # 先写入临时文件再原子替换，避免写入中途崩溃导致文件损坏
+    tmp_file = BLOCKCHAIN_FILE + ".tmp"
+    with open(tmp_file, "wb", buffering=FILE_BUFFER_SIZE) as f:
+        for block in blockchain.chain:
+            f.write(orjson.dumps(block_to_dict(block)) + b"\n")
+    os.replace(tmp_file, BLOCKCHAIN_FILE)
 
     print(f"区块链已保存到 {BLOCKCHAIN_FILE}")
 
 
+# 将新区块追加到日志文件
+def append_block(block):
+    global _journal
+
+    if _journal is None:
+        _journal = open(BLOCKCHAIN_FILE, "ab", buffering=FILE_BUFFER_SIZE)
+
+    _journal.write(orjson.dumps(block_to_dict(block)) + b"\n")
+    _journal.flush()
+
+    index_block(block)
+
+
+# 基于当前链尾创建新区块并追加到区块链和日志文件
+def commit_block(block_data):
+    with _chain_lock:
+        last_block = blockchain.chain[-1]
+
+        new_block = Block(
+            index=last_block.index + 1,
+            timestamp=time.time(),
+            data=block_data,
+            previous_hash=last_block.hash,
+            quantum_signature=block_data["quantum_signature"],
+        )
+
+        # 计算哈希
+        new_block.hash = new_block._calculate_hash()
+
+        # 添加到区块链
+        blockchain.chain.append(new_block)
+
+        # 追加区块到日志文件
+        append_block(new_block)
+
+    return new_block
+
+
 # 网页路由
 @app.route("/")
 def index():
@@ -195,31 +494,21 @@ def pqec_mine():
         block_data = data.get("data", "量子区块")
 
         # 创建新区块
-        last_block = blockchain.chain[-1]
-
         new_block_data = {
             "message": block_data,
             "transactions": [
                 {"type": "coinbase", "amount": 50, "timestamp": time.time()}
             ],
-            "merkle_root": QuantumHash.quantum_hash(json.dumps({"data": block_data})),
-            "quantum_signature": QuantumRandom.generate_random_bits(64),
-            "nonce": int(QuantumRandom.generate_random_bits(32), 2),
-            "quantum_key": QuantumRandom.generate_random_bits(4),
+            "merkle_root": QuantumHash.quantum_hash(
+                canonical_json({"data": block_data})
+            ),
+            "quantum_signature": random_bits(64),
+            "nonce": secrets.randbits(32),
+            "quantum_key": random_bits(4),
             "quantum_proof": proof,
         }
 
-        new_block = Block(
-            index=last_block.index + 1,
-            timestamp=time.time(),
-            data=new_block_data,
-            previous_hash=last_block.hash,
-            quantum_signature=new_block_data["quantum_signature"],
-        )
-
-        new_block.hash = new_block._calculate_hash()
-        blockchain.chain.append(new_block)
-        save_blockchain()
+        new_block = commit_block(new_block_data)
 
         return jsonify(
             {
@@ -250,45 +539,35 @@ def pqec_verify():
 @app.route("/api/blockchain", methods=["GET"])
 def get_blockchain():
     """获取完整区块链"""
-    chain_data = []
+    return Response(_iter_chain_json(), mimetype="application/json")
 
-    for block in blockchain.chain:
-        chain_data.append(
-            {
-                "index": block.index,
-                "timestamp": block.timestamp,
-                "timestamp_human": time.ctime(block.timestamp),
-                "data": block.data,
-                "previous_hash": block.previous_hash,
-                "hash": block.hash,
-                "quantum_signature": block.quantum_signature,
-            }
-        )
 
-    return jsonify({"chain": chain_data, "length": len(chain_data)})
+def _iter_chain_json():
+    """逐个区块输出完整区块链的JSON，避免一次性拼出整个响应"""
+    chain = blockchain.chain[:]
+    yield b'{"chain":['
+    for i, block in enumerate(chain):
+        if i:
+            yield b","
+        yield block_view_bytes(block)
+    yield b'],"length":%d}' % len(chain)
 
 
 @app.route("/api/blocks", methods=["GET"])
 def get_blocks():
     """获取所有区块的简要信息"""
-    blocks_data = []
-
-    for block in blockchain.chain:
-        tx_count = (
-            len(block.data.get("transactions", []))
-            if isinstance(block.data, dict)
-            else 0
-        )
-
-        blocks_data.append(
-            {
-                "index": block.index,
-                "timestamp": block.timestamp,
-                "timestamp_human": time.ctime(block.timestamp),
-                "hash": block.hash,
-                "tx_count": tx_count,
-            }
+    blocks_data = [
+        {
+            "index": index,
+            "timestamp": timestamp,
+            "timestamp_human": timestamp_human,
+            "hash": block_hash,
+            "tx_count": tx_count,
+        }
+        for index, timestamp, timestamp_human, tx_count, block_hash in (
+            _block_metadata.rows()
         )
+    ]
 
     return jsonify(blocks_data)
 
@@ -299,37 +578,13 @@ def get_block(index):
     if index < 0 or index >= len(blockchain.chain):
         return jsonify({"error": "区块不存在"}), 404
 
-    block = blockchain.chain[index]
-
-    block_data = {
-        "index": block.index,
-        "timestamp": block.timestamp,
-        "timestamp_human": time.ctime(block.timestamp),
-        "data": block.data,
-        "previous_hash": block.previous_hash,
-        "hash": block.hash,
-        "quantum_signature": block.quantum_signature,
-    }
-
-    return jsonify(block_data)
+    return block_response(blockchain.chain[index])
 
 
 @app.route("/api/block/latest", methods=["GET"])
 def get_latest_block():
     """获取最新区块"""
-    block = blockchain.chain[-1]
-
-    block_data = {
-        "index": block.index,
-        "timestamp": block.timestamp,
-        "timestamp_human": time.ctime(block.timestamp),
-        "data": block.data,
-        "previous_hash": block.previous_hash,
-        "hash": block.hash,
-        "quantum_signature": block.quantum_signature,
-    }
-
-    return jsonify(block_data)
+    return block_response(blockchain.chain[-1])
 
 
 @app.route("/api/blocks/add", methods=["POST"])
@@ -354,36 +609,18 @@ def add_block():
                 }
             ]
 
-        # 获取最后一个区块
-        last_block = blockchain.chain[-1]
-
         # 准备区块数据
         block_data = {
             "message": data.get("message", "新区块"),
             "transactions": transactions,
-            "merkle_root": QuantumHash.quantum_hash(json.dumps(transactions)),
-            "quantum_signature": QuantumRandom.generate_random_bits(64),
-            "nonce": int(QuantumRandom.generate_random_bits(32), 2),
-            "quantum_key": QuantumRandom.generate_random_bits(4),
+            "merkle_root": QuantumHash.quantum_hash(canonical_json(transactions)),
+            "quantum_signature": random_bits(64),
+            "nonce": secrets.randbits(32),
+            "quantum_key": random_bits(4),
         }
 
-        # 创建新区块
-        new_block = Block(
-            index=last_block.index + 1,
-            timestamp=time.time(),
-            data=block_data,
-            previous_hash=last_block.hash,
-            quantum_signature=block_data["quantum_signature"],
-        )
-
-        # 计算哈希
-        new_block.hash = new_block._calculate_hash()
-
-        # 添加到区块链
-        blockchain.chain.append(new_block)
-
-        # 保存区块链到文件
-        save_blockchain()
+        # 创建新区块并上链
+        new_block = commit_block(block_data)
 
         return jsonify(
             {
@@ -391,7 +628,7 @@ def add_block():
                 "block": {
                     "index": new_block.index,
                     "timestamp": new_block.timestamp,
-                    "timestamp_human": time.ctime(new_block.timestamp),
+                    "timestamp_human": new_block.timestamp_human,
                     "hash": new_block.hash,
                 },
             }
@@ -403,20 +640,18 @@ def add_block():
 @app.route("/api/transactions", methods=["GET"])
 def get_transactions():
     """获取所有交易"""
-    all_transactions = []
-
-    for block in blockchain.chain:
-        if isinstance(block.data, dict) and "transactions" in block.data:
-            for tx in block.data["transactions"]:
-                # 添加区块信息到交易
-                tx_with_block = tx.copy()
-                tx_with_block["block_index"] = block.index
-                tx_with_block["block_hash"] = block.hash
-                tx_with_block["timestamp_human"] = time.ctime(tx.get("timestamp", 0))
+    return Response(_iter_transactions_json(), mimetype="application/json")
 
-                all_transactions.append(tx_with_block)
 
-    return jsonify(all_transactions)
+def _iter_transactions_json():
+    """逐条输出全部交易的JSON数组"""
+    count = len(_all_transactions_json)
+    yield b"["
+    for i in range(count):
+        if i:
+            yield b","
+        yield _all_transactions_json[i]
+    yield b"]"
 
 
 @app.route("/api/search", methods=["GET"])
@@ -429,37 +664,43 @@ def search():
 
     results = {"blocks": [], "transactions": []}
 
-    # 搜索区块
-    for block in blockchain.chain:
-        # 按区块哈希或索引搜索
-        if str(block.index) == query or block.hash.startswith(query):
-            results["blocks"].append(
-                {
-                    "index": block.index,
-                    "timestamp": block.timestamp,
-                    "timestamp_human": time.ctime(block.timestamp),
-                    "hash": block.hash,
-                }
-            )
+    # 按区块哈希或索引搜索
+    for block_index in find_blocks(query):
+        block = blockchain.chain[block_index]
+        results["blocks"].append(
+            {
+                "index": block.index,
+                "timestamp": block.timestamp,
+                "timestamp_human": block.timestamp_human,
+                "hash": block.hash,
+            }
+        )
 
-    # 搜索交易
-    for block in blockchain.chain:
-        if isinstance(block.data, dict) and "transactions" in block.data:
-            for tx in block.data["transactions"]:
-                # 检查交易是否包含查询字符串
-                tx_str = json.dumps(tx, ensure_ascii=False)
-                if query.lower() in tx_str.lower():
-                    tx_result = tx.copy()
-                    tx_result["block_index"] = block.index
-                    tx_result["block_hash"] = block.hash
-                    tx_result["timestamp_human"] = time.ctime(tx.get("timestamp", 0))
-                    results["transactions"].append(tx_result)
+    # 搜索交易（交易文本在区块入链时已预先序列化）
+    query_lower = query.lower()
+    for text, tx_view in zip(_tx_search_entries, _all_transactions):
+        if query_lower in text:
+            results["transactions"].append(tx_view)
 
     return jsonify(results)
 
 
+def serve(host="127.0.0.1", port=9000, threads=16):
+    """多线程启动服务：优先使用waitress，未安装时退回Flask自带的多线程服务器
+
+    也可以用gunicorn部署（区块链保存在进程内存中，只能开一个worker）：
+        gunicorn -w 1 --threads 16 -b 127.0.0.1:9000 app:app
+    """
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        app.run(host=host, port=port, threaded=True)
+    else:
+        waitress_serve(app, host=host, port=port, threads=threads)
+
+
 # 初始化区块链
 initialize_blockchain()
 
 if __name__ == "__main__":
-    app.run(debug=True, host="127.0.0.1", port=9000)
+    serve()
@@ -9,46 +9,128 @@
 import time
 import json
 import hashlib
+import orjson
 import numpy as np
-import matplotlib.pyplot as plt
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import Aer  # 更新导入方式
-from qiskit.visualization import plot_histogram, plot_bloch_multivector
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
-# 导入我们的量子区块链实现
-from quantum_blockchain import QuantumBlockchain, QuantumRandom, QuantumHash, Block
+# qiskit导入较慢，首次使用时才导入，见_quantum()
+_qiskit = None
 
-# 模拟QPanda量子密钥生成功能
-def qpanda_inspired_key_generation(num_qubits=2):
+def _quantum():
     """
-    基于QPanda思想的量子密钥生 ?
-    模拟QPanda的H+CNOT操作来生成纠缠密钥对
+    首次调用时导入qiskit并创建共享的模拟器实例
+    
+    Returns:
+        (QuantumCircuit, transpile, simulator)
+    """
+    global _qiskit
+    if _qiskit is None:
+        from qiskit import QuantumCircuit, transpile
+        from qiskit_aer import Aer  # 更新导入方式
+        _qiskit = (QuantumCircuit, transpile, Aer.get_backend('qasm_simulator'))
+    return _qiskit
+
+# 已编译电路的缓存：电路指纹 -> 编译结果，最多保留32个
+_COMPILED_CACHE_SIZE = 32
+_compiled_circuits = OrderedDict()
+
+def _circuit_fingerprint(qc):
+    """电路结构的指纹：量子比特数、经典比特数和每个门的名称、参数及作用位置"""
+    return (qc.num_qubits, qc.num_clbits, tuple(
+        (inst.operation.name,
+         tuple(inst.operation.params),
+         tuple(qc.find_bit(q).index for q in inst.qubits),
+         tuple(qc.find_bit(c).index for c in inst.clbits))
+        for inst in qc.data))
+
+def compile_circuit(qc):
+    """
+    在共享模拟器上编译电路，结构相同的电路只编译一次
     
     Args:
-        num_qubits: 量子比特数量
+        qc: 待编译的量子电路
         
     Returns:
-        测量结果和量子密 ?
+        编译后的量子电路
     """
-    print("\n===== QPanda启发的量子密钥生 ?=====")
+    _, transpile, simulator = _quantum()
+    key = _circuit_fingerprint(qc)
+    compiled = _compiled_circuits.get(key)
+    if compiled is None:
+        compiled = transpile(qc, simulator)
+        _compiled_circuits[key] = compiled
+        if len(_compiled_circuits) > _COMPILED_CACHE_SIZE:
+            _compiled_circuits.popitem(last=False)
+    else:
+        _compiled_circuits.move_to_end(key)
+    return compiled
+
+@lru_cache(maxsize=None)
+def _random_circuit():
+    """编译4量子比特随机数电路，只编译一次"""
+    QuantumCircuit, _, _ = _quantum()
+    qc = QuantumCircuit(4, 4)
+    for i in range(4):
+        qc.h(i)
+    qc.measure(range(4), range(4))
+    return compile_circuit(qc)
+
+def get_random_bits(n):
+    """
+    执行一次预编译电路，生成n个4比特量子随机数
+    
+    Args:
+        n: 需要的随机数个数
+        
+    Returns:
+        4比特二进制字符串列表
+    """
+    # 每次测量记录一个结果，shots=n代替n次单独执行
+    _, _, simulator = _quantum()
+    job = simulator.run(_random_circuit(), shots=max(n, 1), memory=True)
+    return job.result().get_memory()[:n]
+
+@lru_cache(maxsize=None)
+def _key_circuit(num_qubits):
+    """构建并编译密钥生成电路，同一规模只编译一次"""
+    QuantumCircuit, _, _ = _quantum()
+    
     # 创建量子电路
     qc = QuantumCircuit(num_qubits, num_qubits)
     
-    # 应用H门到第一个量子比特（类似QPanda的H操作 ?
+    # 应用H门到第一个量子比特（类似QPanda的H操作）
     qc.h(0)
     
-    # 应用CNOT门创建纠缠（类似QPanda中的CNOT操作 ?
+    # 应用CNOT门创建纠缠（类似QPanda中的CNOT操作）
     qc.cx(0, 1)
     
-    # 测量所有量子比 ?
+    # 测量所有量子比特
     qc.measure(range(num_qubits), range(num_qubits))
     
+    return qc, compile_circuit(qc)
+
+# 模拟QPanda量子密钥生成功能
+def qpanda_inspired_key_generation(num_qubits=2):
+    """
+    基于QPanda思想的量子密钥生 ?
+    模拟QPanda的H+CNOT操作来生成纠缠密钥对
+    
+    Args:
+        num_qubits: 量子比特数量
+        
+    Returns:
+        测量结果和量子密 ?
+    """
+    print("\n===== QPanda启发的量子密钥生 ?=====")
+    qc, qc_compiled = _key_circuit(num_qubits)
+    _, _, simulator = _quantum()
+    
     # 在模拟器上执行电 ?
-    simulator = Aer.get_backend('qasm_simulator')
-    qc_compiled = transpile(qc, simulator)
     job = simulator.run(qc_compiled, shots=1024)
     result = job.result()
-    counts = result.get_counts(qc)
+    counts = result.get_counts()
     
     # 展示电路
     print(f"量子电路（类似QPanda ?\n{qc}")
@@ -82,6 +164,7 @@ def qsharp_inspired_quantum_sign(message, key):
     print(f"初始SHA-256哈希: {initial_hash[:16]}...")
     
     # 创建量子电路，模拟Q#中的量子叠加
+    QuantumCircuit, _, simulator = _quantum()
     num_qubits = 8
     qc = QuantumCircuit(num_qubits, num_qubits)
     
@@ -90,14 +173,17 @@ def qsharp_inspired_quantum_sign(message, key):
         qc.h(i)
     
     # 使用密钥bits调整量子门，模拟格密码操 ?
-    for i, bit in enumerate(key[:min(len(key), num_qubits)]):
-        if bit == '1':
-            qc.z(i % num_qubits)
+    key_bits = np.frombuffer(key[:num_qubits].encode(), dtype=np.uint8) == ord('1')
+    for i in np.flatnonzero(key_bits):
+        qc.z(int(i))
     
     # 根据消息内容添加额外的量子操 ?
-    for char in message:
-        qubit_idx = ord(char) % num_qubits
-        qc.t(qubit_idx)  # 应用T门，模拟更复杂的格操 ?
+    # 按字符码位统计每个量子比特上的T门数量；T^8=I，每个比特最多只需7个T门
+    code_points = np.frombuffer(message.encode('utf-32-le'), dtype=np.uint32)
+    t_counts = np.bincount(code_points % num_qubits, minlength=num_qubits) % 8
+    for qubit_idx in np.flatnonzero(t_counts):
+        for _ in range(int(t_counts[qubit_idx])):
+            qc.t(int(qubit_idx))  # 应用T门，模拟更复杂的格操 ?
     
     # 构建纠缠，类似于格密码的混合结构
     for i in range(num_qubits-1):
@@ -107,11 +193,10 @@ def qsharp_inspired_quantum_sign(message, key):
     qc.measure(range(num_qubits), range(num_qubits))
     
     # 在模拟器上执行电 ?
-    simulator = Aer.get_backend('qasm_simulator')
-    qc_compiled = transpile(qc, simulator)
+    qc_compiled = compile_circuit(qc)
     job = simulator.run(qc_compiled, shots=512)
     result = job.result()
-    counts = result.get_counts(qc)
+    counts = result.get_counts()
     
     # 从测量结果构建量子签名部 ?
     top_measurements = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:3]
@@ -126,6 +211,13 @@ def qsharp_inspired_quantum_sign(message, key):
     
     return final_signature
 
+# 交易数达到该值时使用多进程计算叶子哈希
+PARALLEL_LEAF_THRESHOLD = 1024
+
+def _fractal_leaf_hash(data):
+    """分形Merkle树的基础哈希，定义在模块级以便多进程调用"""
+    return hashlib.sha256(data).digest()
+
 # 模拟分形Merkle树实 ?
 def fractal_merkle_tree(transactions):
     """
@@ -139,32 +231,24 @@ def fractal_merkle_tree(transactions):
     """
     print("\n===== 量子分形Merkle树实 ?=====")
     
-    def _generate_quantum_randomness():
-        # 创建小型量子电路生成随机 ?
-        qc = QuantumCircuit(4, 4)
-        for i in range(4):
-            qc.h(i)
-        qc.measure(range(4), range(4))
-        
-        # 在模拟器上执行电 ?
-        simulator = Aer.get_backend('qasm_simulator')
-        qc_compiled = transpile(qc, simulator)
-        job = simulator.run(qc_compiled, shots=1)
-        result = job.result()
-        counts = result.get_counts(qc)
-        random_bits = list(counts.keys())[0]
-        return random_bits
+    # 整棵树需要的哈希次数：叶子数加上每一层的内部节点数
+    total_hashes = len(transactions)
+    level_size = len(transactions)
+    while level_size > 1:
+        level_size = (level_size + 1) // 2
+        total_hashes += level_size
+    
+    # 一次量子电路执行生成所有哈希所需的4比特随机数
+    q_randoms = iter(get_random_bits(total_hashes))
     
     def _fractal_hash(data):
-        # 使用SHA-256代替SHA3-512作为基础哈希函数
-        basic_hash = hashlib.sha256(data.encode()).hexdigest()
-        
-        # 添加量子随机 ?
-        q_random = _generate_quantum_randomness()
-        
+        # 使用SHA-256代替SHA3-512作为基础哈希函数，全程使用32字节摘要
+        return _combine_quantum_randomness(_fractal_leaf_hash(data))
+    
+    def _combine_quantum_randomness(basic_hash):
         # 结合基础哈希和量子随机 ?
-        combined = basic_hash + q_random
-        return hashlib.sha256(combined.encode()).hexdigest()
+        combined = basic_hash + next(q_randoms).encode()
+        return hashlib.sha256(combined).digest()
     
     def _recursive_merkle(items):
         if len(items) == 1:
@@ -180,7 +264,7 @@ def fractal_merkle_tree(transactions):
             combined = items[i] + items[i+1]
             if len(next_level) > 0:
                 # 添加分形"记忆"，使每个节点受到整个树的影响
-                fractal_memory = hashlib.md5(next_level[-1].encode()).hexdigest()[:8]
+                fractal_memory = hashlib.md5(next_level[-1]).digest()[:4]
                 combined += fractal_memory
             
             next_level.append(_fractal_hash(combined))
@@ -188,16 +272,52 @@ def fractal_merkle_tree(transactions):
         return _recursive_merkle(next_level)
     
     # 哈希化所有交 ?
-    hashed_transactions = [_fractal_hash(json.dumps(tx)) for tx in transactions]
+    # 交易较多时在多个进程中并行计算叶子哈希
+    leaves = [orjson.dumps(tx) for tx in transactions]
+    if len(leaves) >= PARALLEL_LEAF_THRESHOLD:
+        with ProcessPoolExecutor() as executor:
+            leaf_hashes = list(executor.map(_fractal_leaf_hash, leaves, chunksize=64))
+    else:
+        leaf_hashes = [_fractal_leaf_hash(leaf) for leaf in leaves]
+    hashed_transactions = [_combine_quantum_randomness(h) for h in leaf_hashes]
     
     # 计算分形Merkle ?
-    merkle_root = _recursive_merkle(hashed_transactions)
+    merkle_root = _recursive_merkle(hashed_transactions).hex()
     
     print(f"交易数量: {len(transactions)}")
     print(f"分形Merkle ? {merkle_root[:16]}...")
     
     return merkle_root
 
+def _scan_nonce(prefix_bytes, difficulty, start_nonce, max_attempts=1 << 24):
+    """
+    从start_nonce开始顺序扫描，寻找哈希满足难度要求的nonce
+    
+    Args:
+        prefix_bytes: 哈希输入的固定前缀
+        difficulty: 所需的前导零数量
+        start_nonce: 起始nonce
+        max_attempts: 最大尝试次数
+        
+    Returns:
+        (nonce, 尝试次数, 哈希)，未找到时nonce为-1
+    """
+    # 前导零以十六进制位计，每位4比特；满足难度的摘要不大于target，
+    # 等长字节串按字典序比较即按数值比较
+    target = ((1 << (256 - 4 * difficulty)) - 1).to_bytes(32, 'big')
+    
+    # 固定前缀只哈希一次，之后每个nonce复制该中间状态
+    base = hashlib.sha256(prefix_bytes)
+    digest = b''
+    for attempts in range(1, max_attempts + 1):
+        nonce = start_nonce + attempts - 1
+        h = base.copy()
+        h.update(str(nonce).encode())
+        digest = h.digest()
+        if digest <= target:
+            return nonce, attempts, digest.hex()
+    return -1, max_attempts, digest.hex()
+
 # 创建Grover算法模拟的简化版 ?
 def simulate_grover_search(target_hash_prefix, difficulty=4):
     """
@@ -212,31 +332,15 @@ def simulate_grover_search(target_hash_prefix, difficulty=4):
     """
     print("\n===== 量子Grover算法挖矿模拟 =====")
     
-    # 在实际Grover算法中，这将是一个量子搜 ?
-    # 我们在这里使用简化模 ?
-    attempts = 0
-    nonce = 0
-    target = '0' * difficulty
-    
+    # 在实际Grover算法中，这将是一个量子搜索
+    # 这里只用量子随机数选取起始nonce，然后顺序扫描
     print(f"挖矿目标: 哈希前缀必须有{difficulty}个前导零")
     start_time = time.time()
     
-    while True:
-        attempts += 1
-        nonce = QuantumRandom.generate_random_bits(16)
-        nonce_decimal = int(nonce, 2)
-        
-        # 计算哈希
-        hash_input = f"{target_hash_prefix}{nonce_decimal}"
-        current_hash = hashlib.sha256(hash_input.encode()).hexdigest()
-        
-        # 检查是否满足难度要 ?
-        if current_hash.startswith(target):
-            break
-        
-        # 打印进度，每100次尝 ?
-        if attempts % 100 == 0:
-            print(f"已尝 ? {attempts} ? 当前哈希: {current_hash[:10]}...")
+    from quantum_blockchain import QuantumRandom
+    start_nonce = int(QuantumRandom.generate_random_bits(16), 2)
+    nonce_decimal, attempts, current_hash = _scan_nonce(
+        target_hash_prefix.encode(), difficulty, start_nonce)
     
     elapsed_time = time.time() - start_time
     
@@ -275,6 +379,8 @@ def create_genesis_quantum_block():
     
     # 6. 创建最终的创世区块
     print("\n===== 创建最终创世区块 =====")
+    # 导入我们的量子区块链实现
+    from quantum_blockchain import QuantumBlockchain
     blockchain = QuantumBlockchain()  # 创建一个新的区块链，自动生成创世区块
     
     # 修改创世区块以包含我们生成的所有量子增强属性
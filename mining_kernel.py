@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+工作量证明挖矿内核
+用 Numba 编译 SHA-256 压缩函数和nonce搜索循环：从前缀的中间状态开始计算，
+搜索时释放GIL并按块并行，结果与 hashlib.sha256 逐字节一致
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """未安装numba时按普通Python函数执行（调用方只在NUMBA_AVAILABLE时使用内核）"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# 每批nonce拆分成的并行块数
+SEARCH_CHUNKS = 64
+
+_MASK32 = 0xFFFFFFFF
+
+# SHA-256 轮常量与初始状态
+_K = np.array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+], dtype=np.int64)
+
+_H0 = np.array([
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+], dtype=np.int64)
+
+
+@njit(cache=True)
+def _compress(state, buf, offset, k):
+    """对buf[offset:offset+64]执行一次SHA-256压缩，原地更新state（32位字存于int64）"""
+    w = np.empty(64, np.int64)
+    for t in range(16):
+        i = offset + 4 * t
+        w[t] = ((np.int64(buf[i]) << 24) | (np.int64(buf[i + 1]) << 16)
+                | (np.int64(buf[i + 2]) << 8) | np.int64(buf[i + 3]))
+    for t in range(16, 64):
+        x = w[t - 15]
+        y = w[t - 2]
+        s0 = (((x >> 7) | (x << 25)) ^ ((x >> 18) | (x << 14)) ^ (x >> 3)) & _MASK32
+        s1 = (((y >> 17) | (y << 15)) ^ ((y >> 19) | (y << 13)) ^ (y >> 10)) & _MASK32
+        w[t] = (w[t - 16] + s0 + w[t - 7] + s1) & _MASK32
+
+    a, b, c, d = state[0], state[1], state[2], state[3]
+    e, f, g, h = state[4], state[5], state[6], state[7]
+    for t in range(64):
+        S1 = (((e >> 6) | (e << 26)) ^ ((e >> 11) | (e << 21)) ^ ((e >> 25) | (e << 7))) & _MASK32
+        ch = (e & f) ^ (~e & g & _MASK32)
+        t1 = (h + S1 + ch + k[t] + w[t]) & _MASK32
+        S0 = (((a >> 2) | (a << 30)) ^ ((a >> 13) | (a << 19)) ^ ((a >> 22) | (a << 10))) & _MASK32
+        maj = (a & b) ^ (a & c) ^ (b & c)
+        t2 = (S0 + maj) & _MASK32
+        h = g
+        g = f
+        f = e
+        e = (d + t1) & _MASK32
+        d = c
+        c = b
+        b = a
+        a = (t1 + t2) & _MASK32
+
+    state[0] = (state[0] + a) & _MASK32
+    state[1] = (state[1] + b) & _MASK32
+    state[2] = (state[2] + c) & _MASK32
+    state[3] = (state[3] + d) & _MASK32
+    state[4] = (state[4] + e) & _MASK32
+    state[5] = (state[5] + f) & _MASK32
+    state[6] = (state[6] + g) & _MASK32
+    state[7] = (state[7] + h) & _MASK32
+
+
+@njit(cache=True)
+def _has_leading_zero_bits(state, zero_bits):
+    """摘要（按大端32位字）的前zero_bits位是否全为0"""
+    for i in range(8):
+        if zero_bits <= 0:
+            return True
+        if zero_bits >= 32:
+            if state[i] != 0:
+                return False
+        elif state[i] >> (32 - zero_bits):
+            return False
+        zero_bits -= 32
+    return True
+
+
+@njit(nogil=True, parallel=True, cache=True)
+def _find_nonce(midstate, head, suffix, consumed, zero_bits, start, count, chunks, k):
+    """
+    在 [start, start + count) 中搜索最小的满足难度的nonce
+
+    每块顺序扫描并记录块内第一个命中，最后取最靠前的块，因此结果与串行搜索相同
+    """
+    step = (count + chunks - 1) // chunks
+    hits = np.full(chunks, -1, np.int64)
+    size = head.shape[0] + 20 + suffix.shape[0] + 72
+    for c in prange(chunks):
+        lo = start + c * step
+        hi = min(lo + step, start + count)
+        buf = np.zeros(size, np.uint8)
+        buf[:head.shape[0]] = head
+        digits = np.empty(20, np.uint8)
+        state = np.empty(8, np.int64)
+        last_nd = -1
+        end = 0
+        for nonce in range(lo, hi):
+            # nonce的十进制ASCII表示
+            n = nonce
+            nd = 0
+            while True:
+                digits[nd] = 48 + n % 10
+                n //= 10
+                nd += 1
+                if n == 0:
+                    break
+            pos = head.shape[0]
+            for j in range(nd):
+                buf[pos + j] = digits[nd - 1 - j]
+
+            # 后缀与填充只取决于nonce的位数，位数不变时沿用上一次写入的字节
+            if nd != last_nd:
+                last_nd = nd
+                pos += nd
+                buf[pos:pos + suffix.shape[0]] = suffix
+                pos += suffix.shape[0]
+
+                # SHA-256 填充：0x80、补零至56字节对齐、64位大端消息比特长度
+                bit_len = (consumed + pos) * 8
+                buf[pos] = 0x80
+                pos += 1
+                while pos % 64 != 56:
+                    buf[pos] = 0
+                    pos += 1
+                for j in range(8):
+                    buf[pos + j] = (bit_len >> (56 - 8 * j)) & 0xFF
+                end = pos + 8
+
+            state[:] = midstate
+            for offset in range(0, end, 64):
+                _compress(state, buf, offset, k)
+            if _has_leading_zero_bits(state, zero_bits):
+                hits[c] = nonce
+                break
+
+    for c in range(chunks):
+        if hits[c] >= 0:
+            return hits[c]
+    return -1
+
+
+def midstate(prefix: bytes):
+    """
+    计算前缀中完整64字节块的SHA-256中间状态
+
+    Returns:
+        (中间状态, 剩余未满一块的字节, 已压缩的字节数)
+    """
+    data = np.frombuffer(prefix, dtype=np.uint8).copy()
+    full = len(prefix) // 64 * 64
+    state = _H0.copy()
+    for offset in range(0, full, 64):
+        _compress(state, data, offset, _K)
+    return state, data[full:].copy(), full
+
+
+def search_nonce(prefix: bytes, suffix: bytes, difficulty: int, start: int, count: int) -> int:
+    """
+    搜索使 sha256(prefix + str(nonce) + suffix) 满足难度的nonce
+
+    Args:
+        prefix: nonce之前的字节
+        suffix: nonce之后的字节
+        difficulty: 十六进制前导零个数
+        start: 起始nonce
+        count: 本批尝试次数
+
+    Returns:
+        找到的nonce，本批未找到时返回-1
+    """
+    state, head, consumed = midstate(prefix)
+    tail = np.frombuffer(suffix, dtype=np.uint8).copy()
+    return int(_find_nonce(state, head, tail, consumed, 4 * difficulty,
+                           start, count, SEARCH_CHUNKS, _K))
+
+
+@njit(nogil=True, parallel=True, cache=True)
+def _hash_many(data, offsets, k, h0):
+    """并行计算多条消息的SHA-256，消息i为data[offsets[i]:offsets[i+1]]"""
+    n = offsets.shape[0] - 1
+    out = np.empty((n, 32), np.uint8)
+    for m in prange(n):
+        lo = offsets[m]
+        length = offsets[m + 1] - lo
+        padded = (length + 9 + 63) // 64 * 64
+        buf = np.zeros(padded, np.uint8)
+        buf[:length] = data[lo:lo + length]
+        buf[length] = 0x80
+        bit_len = length * 8
+        for j in range(8):
+            buf[padded - 8 + j] = (bit_len >> (56 - 8 * j)) & 0xFF
+        state = h0.copy()
+        for offset in range(0, padded, 64):
+            _compress(state, buf, offset, k)
+        for i in range(8):
+            for j in range(4):
+                out[m, 4 * i + j] = (state[i] >> (24 - 8 * j)) & 0xFF
+    return out
+
+
+def hash_many(messages):
+    """
+    批量计算多条消息的SHA-256摘要（各消息相互独立，按消息并行）
+
+    Args:
+        messages: 字节串列表
+
+    Returns:
+        与消息一一对应的32字节摘要列表
+    """
+    if not messages:
+        return []
+    offsets = np.zeros(len(messages) + 1, dtype=np.int64)
+    np.cumsum([len(m) for m in messages], out=offsets[1:])
+    data = np.frombuffer(b''.join(messages), dtype=np.uint8).copy()
+    out = _hash_many(data, offsets, _K, _H0)
+    return [row.tobytes() for row in out]
@@ -6,7 +6,12 @@
 此模块展示如何从 Python 调用 Q# 量子算法
 """
 
+import os
 import sys
+from functools import lru_cache
+
+import numpy as np
+import orjson
 
 try:
     import qsharp
@@ -16,6 +21,9 @@ except ImportError:
     print("警告：qsharp 包未安装，Q# 功能将不可用")
     print("安装命令：pip install qsharp")
 
+# 经典模拟使用的随机数生成器
+_DEFAULT_RNG = np.random.default_rng()
+
 # 导入 Q# 操作 (如果 qsharp 可用)
 if QSHARP_AVAILABLE:
     from QuantumBlockchain.Core import (
@@ -68,8 +76,7 @@ class QuantumRandomNumberGenerator:
     def generate_bits(num_bits: int) -> list:
         """生成随机比特串"""
         if not QSHARP_AVAILABLE:
-            import random
-            return [random.randint(0, 1) for _ in range(num_bits)]
+            return _DEFAULT_RNG.integers(0, 2, size=num_bits, dtype=np.uint8).tolist()
         results = GenerateRandomBitString.simulate(numBits=num_bits)
         return [int(r) for r in results]
     
@@ -90,10 +97,16 @@ class QuantumRandomNumberGenerator:
         return GenerateRandomHexString.simulate(numBytes=num_bytes)
 
 
+def _code_points(text: str) -> list:
+    """字符串的 Unicode 码位列表 (与逐字符 ord 相同)，由 UTF-32 编码一次性得到"""
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).tolist()
+
+
 class QuantumHashFunction:
     """
     量子哈希函数
     使用 Q# 量子算法计算抗量子哈希
+    相同输入的结果会被缓存，调用方不应依赖每次调用得到新的量子随机性
     """
     
     @staticmethod
@@ -108,15 +121,23 @@ class QuantumHashFunction:
         Returns:
             哈希比特列表
         """
+        # 缓存中保存元组，每次返回新的列表，避免调用方修改缓存内容
+        return list(QuantumHashFunction._hash_bits(data, output_size))
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _hash_bits(data: str, output_size: int) -> tuple:
+        """量子哈希比特的实际计算"""
         if not QSHARP_AVAILABLE:
             import hashlib
-            h = hashlib.sha256(data.encode()).hexdigest()
-            return [int(b) for b in bin(int(h, 16))[2:].zfill(256)]
+            h = hashlib.sha256(data.encode()).digest()
+            return tuple(np.unpackbits(np.frombuffer(h, dtype=np.uint8)).tolist())
         
-        int_data = [ord(c) for c in data]
-        return QuantumHash.simulate(inputData=int_data, outputSize=output_size)
+        int_data = _code_points(data)
+        return tuple(QuantumHash.simulate(inputData=int_data, outputSize=output_size))
     
     @staticmethod
+    @lru_cache(maxsize=4096)
     def hash_to_hex(data: str, output_size: int = 64) -> str:
         """
         计算数据的量子哈希并返回十六进制字符串
@@ -130,9 +151,10 @@ class QuantumHashFunction:
         """
         if not QSHARP_AVAILABLE:
             import hashlib
-            return hashlib.sha256(data.encode()).hexdigest()[:output_size//4]
+            n = output_size // 4
+            return hashlib.sha256(data.encode()).digest()[:(n + 1) // 2].hex()[:n]
         
-        int_data = [ord(c) for c in data]
+        int_data = _code_points(data)
         return QuantumHashToString.simulate(inputData=int_data, outputSize=output_size)
 
 
@@ -156,7 +178,7 @@ class QuantumKeyDistribution:
         if not QSHARP_AVAILABLE:
             import secrets
             key = secrets.token_bytes(num_bits // 8)
-            return [int(b) for b in ''.join(format(byte, '08b') for byte in key)]
+            return np.unpackbits(np.frombuffer(key, dtype=np.uint8)).tolist()
         
         return BB84Protocol.simulate(numBits=num_bits)
     
@@ -177,12 +199,93 @@ class QuantumKeyDistribution:
             # 经典模拟：如果密钥相同则无窃听
             if key1 == key2:
                 return 0.0
-            mismatches = sum(1 for a, b in zip(key1, key2) if a != b)
-            return mismatches / min(len(key1), len(key2))
+            n = min(len(key1), len(key2))
+            a = np.asarray(key1[:n], dtype=np.uint8)
+            b = np.asarray(key2[:n], dtype=np.uint8)
+            return int(np.count_nonzero(a != b)) / n
         
         return DetectEavesdropping.simulate(key1=key1, key2=key2, sampleSize=sample_size)
 
 
+# 经典挖矿模拟的最大nonce
+CLASSICAL_MAX_NONCE = 1000000
+
+
+def _classical_search(block_hash, difficulty: int, start: int, stop: int, step: int = 1):
+    """
+    经典挖矿：在 range(start, stop, step) 中寻找使 sha256(f"{block_hash}{nonce}")
+    满足难度 (十六进制前导零数量) 的最小 nonce
+
+    Returns:
+        找到的 nonce，未找到时返回 None
+    """
+    import hashlib
+    # 固定前缀只哈希一次，之后每个 nonce 复制该中间状态
+    prefix = hashlib.sha256(str(block_hash).encode())
+    # 每个字节对应两个十六进制零，奇数难度时再检查下一字节的高4位
+    zero_bytes = bytes(difficulty // 2)
+    n = len(zero_bytes)
+    half = difficulty & 1
+    for nonce in range(start, stop, step):
+        h = prefix.copy()
+        h.update(str(nonce).encode())
+        d = h.digest()
+        if d[:n] == zero_bytes and (not half or d[n] >> 4 == 0):
+            return nonce
+    return None
+
+
+# 难度不低于该值时使用多进程并行挖矿（难度较低时进程启动开销大于收益）
+PARALLEL_MIN_DIFFICULTY = 5
+
+# 工作进程间共享的当前最小 nonce
+_best_nonce = None
+
+
+def _init_mining_worker(best_nonce):
+    global _best_nonce
+    _best_nonce = best_nonce
+
+
+def _parallel_search_worker(block_hash, difficulty: int, start: int, stop: int, step: int,
+                            batch: int = 4096):
+    """并行挖矿的工作进程：分批扫描，其它进程已找到更小的 nonce 时提前结束"""
+    span = step * batch
+    for batch_start in range(start, stop, span):
+        if batch_start > _best_nonce.value:
+            return None
+        nonce = _classical_search(block_hash, difficulty, batch_start,
+                                  min(batch_start + span, stop), step)
+        if nonce is not None:
+            with _best_nonce.get_lock():
+                if nonce < _best_nonce.value:
+                    _best_nonce.value = nonce
+            return nonce
+    return None
+
+
+def _parallel_classical_search(block_hash, difficulty: int, stop: int):
+    """
+    按 CPU 核数划分 nonce 空间并行挖矿，第 k 个进程扫描 k, k+N, k+2N, ...
+
+    Returns:
+        与串行扫描相同的最小有效 nonce，未找到时返回 None
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    workers = os.cpu_count() or 1
+    best = multiprocessing.Value('q', stop)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_mining_worker,
+                             initargs=(best,)) as executor:
+        futures = [
+            executor.submit(_parallel_search_worker, block_hash, difficulty, k, stop, workers)
+            for k in range(workers)
+        ]
+        found = [f.result() for f in futures]
+    found = [nonce for nonce in found if nonce is not None]
+    return min(found) if found else None
+
+
 class QuantumMiner:
     """
     量子矿工
@@ -203,19 +306,12 @@ class QuantumMiner:
             有效的 nonce 值
         """
         if not QSHARP_AVAILABLE:
-            # 经典挖矿模拟
-            import hashlib
-            import time
-            target = '0' * difficulty
-            nonce = 0
-            while True:
-                test_hash = hashlib.sha256(f"{block_hash}{nonce}".encode()).hexdigest()
-                if test_hash.startswith(target):
-                    return nonce
-                nonce += 1
-                if nonce > 1000000:
-                    break
-            return nonce
+            # 经典挖矿模拟，难度较高时多进程并行
+            if difficulty >= PARALLEL_MIN_DIFFICULTY and (os.cpu_count() or 1) > 1:
+                nonce = _parallel_classical_search(block_hash, difficulty, CLASSICAL_MAX_NONCE + 1)
+            else:
+                nonce = _classical_search(block_hash, difficulty, 0, CLASSICAL_MAX_NONCE + 1)
+            return CLASSICAL_MAX_NONCE + 1 if nonce is None else nonce
         
         return QuantumMining.simulate(
             blockHash=block_hash,
@@ -359,6 +455,49 @@ class QuantumSignature:
         return QuantumVerify.simulate(message=message, signature=signature, publicKey=public_key)
 
 
+# 交易数不低于该值时使用多进程构建 Merkle 树的底部各层
+# (64 字节的节点输入不足以让 hashlib 释放 GIL，线程池无法并行)
+PARALLEL_MERKLE_THRESHOLD = 4096
+
+
+def _merkle_hash_leaves(leaves: list) -> bytes:
+    """对一批已编码的交易求 SHA-256，返回拼接的十六进制摘要（ASCII）"""
+    import hashlib
+    return b''.join(hashlib.sha256(leaf).hexdigest().encode() for leaf in leaves)
+
+
+def _merkle_hash_pairs(level: bytes) -> bytes:
+    """对拼接的节点对（两个 64 位十六进制摘要）逐一求 SHA-256，返回拼接的十六进制摘要"""
+    import hashlib
+    view = memoryview(level)
+    return b''.join(
+        hashlib.sha256(view[i:i+128]).hexdigest().encode() for i in range(0, len(view), 128))
+
+
+def _parallel_merkle_level(transactions: list) -> list:
+    """
+    多进程计算 Merkle 树的叶子层及节点数仍不低于阈值的各层，
+    各层以拼接的字节串在进程间传递，减少序列化开销
+
+    Returns:
+        剩余层的十六进制摘要列表，由调用方串行完成
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    workers = os.cpu_count() or 1
+    leaves = [str(tx).encode() for tx in transactions]
+    size = -(-len(leaves) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        level = b''.join(executor.map(
+            _merkle_hash_leaves, [leaves[i:i+size] for i in range(0, len(leaves), size)]))
+        while len(level) // 64 >= PARALLEL_MERKLE_THRESHOLD:
+            if len(level) // 64 % 2 == 1:
+                level += level[-64:]
+            size = -(-len(level) // 128 // (workers * 4)) * 128
+            level = b''.join(executor.map(
+                _merkle_hash_pairs, [level[i:i+size] for i in range(0, len(level), size)]))
+    return [level[i:i+64].decode() for i in range(0, len(level), 64)]
+
+
 class QuantumBlockchainIntegration:
     """
     量子区块链集成类
@@ -379,18 +518,15 @@ class QuantumBlockchainIntegration:
     
     def hash_block_data(self, data: dict) -> str:
         """计算区块数据的量子哈希"""
-        import json
-        data_str = json.dumps(data, sort_keys=True)
+        data_str = orjson.dumps(data, option=orjson.OPT_SORT_KEYS).decode()
         return self.qhash.hash_to_hex(data_str, 256)
     
     def generate_node_communication_key(self, num_bits: int = 256) -> str:
         """生成节点间通信的量子密钥"""
         key_bits = self.qkd.generate_shared_key(num_bits)
-        # 转换为十六进制
-        key_int = 0
-        for i, bit in enumerate(key_bits[:64]):
-            key_int += bit << i
-        return format(key_int, '016x')
+        # 前64比特按小端位序打包为整数后转换为十六进制
+        packed = np.packbits(np.asarray(key_bits[:64], dtype=np.uint8), bitorder='little')
+        return format(int.from_bytes(packed.tobytes(), 'little'), '016x')
     
     def mine_block(self, block_hash: str, difficulty: int = 4) -> int:
         """挖矿寻找有效 nonce"""
@@ -409,7 +545,10 @@ class QuantumBlockchainIntegration:
         """
         if not QSHARP_AVAILABLE:
             import hashlib
-            hashes = [hashlib.sha256(str(tx).encode()).hexdigest() for tx in transactions]
+            if len(transactions) >= PARALLEL_MERKLE_THRESHOLD and (os.cpu_count() or 1) > 1:
+                hashes = _parallel_merkle_level(transactions)
+            else:
+                hashes = [hashlib.sha256(str(tx).encode()).hexdigest() for tx in transactions]
             while len(hashes) > 1:
                 if len(hashes) % 2 == 1:
                     hashes.append(hashes[-1])
@@ -420,7 +559,7 @@ class QuantumBlockchainIntegration:
             return hashes[0]
         
         # 使用 Q# 量子 Merkle 树
-        tx_ints = [[ord(c) for c in str(tx)] for tx in transactions]
+        tx_ints = [_code_points(str(tx)) for tx in transactions]
         root = QuantumMerkleRoot.simulate(transactions=tx_ints)
         return ''.join(str(b) for b in root[:64])
     
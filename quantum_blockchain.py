@@ -8,15 +8,74 @@
 
 import hashlib
 import json
+import os
+import secrets
+import struct
 import time
 import datetime as dt
+from functools import lru_cache, partial
+from types import SimpleNamespace
 from typing import Dict, List, Any, Optional
 
-# 量子计算相关库
 import numpy as np
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import Aer
-from qiskit.visualization import plot_histogram
+import orjson
+
+# 是否使用量子模拟器生成随机比特；默认直接使用系统的密码学安全随机源
+# （Hadamard+测量在经典模拟器上等价于均匀随机比特，模拟只会增加开销）
+USE_QUANTUM_SIM = False
+
+# 随机数电路的量子比特数，安全值，低于Qiskit模拟器的28比特限制
+RNG_QUBITS = 16
+
+# 是否在哈希中加入量子电路测量分布；固定电路的测量分布除采样噪声外是确定的，
+# 并不增加熵，默认只使用SHA-256，设置环境变量QCHAIN_QUANTUM_HASH后启用
+USE_QUANTUM_HASH = bool(os.environ.get('QCHAIN_QUANTUM_HASH'))
+
+# 量子哈希电路的量子比特数
+HASH_QUBITS = 8  # 使用8个量子比特，安全地低于Qiskit模拟器的限制
+
+@lru_cache(maxsize=1)
+def _quantum_circuits() -> SimpleNamespace:
+    """
+    导入Qiskit并编译随机数电路与哈希电路，首次使用量子模拟时执行一次
+    
+    默认配置（USE_QUANTUM_SIM与USE_QUANTUM_HASH均关闭）下不会调用，导入本模块时不加载Qiskit
+    
+    Returns:
+        包含 simulator、rng_circuit、hash_circuit、hash_flips、hash_theta 的命名空间
+    """
+    # 量子计算相关库
+    from qiskit import QuantumCircuit, transpile
+    from qiskit.circuit import ParameterVector
+    from qiskit_aer import Aer
+    
+    # 共享的模拟器实例及预先编译的随机数电路（所有量子位置于叠加态后测量）
+    simulator = Aer.get_backend('qasm_simulator')
+    rng_qc = QuantumCircuit(RNG_QUBITS, RNG_QUBITS)
+    rng_qc.h(range(RNG_QUBITS))
+    rng_qc.measure(range(RNG_QUBITS), range(RNG_QUBITS))
+    
+    # 量子哈希电路的骨架：结构固定，输入相关的部分为参数
+    flips = ParameterVector('flip', HASH_QUBITS)
+    theta = ParameterVector('theta', HASH_QUBITS)
+    hash_qc = QuantumCircuit(HASH_QUBITS, HASH_QUBITS)
+    for i in range(HASH_QUBITS):
+        hash_qc.rx(flips[i], i)  # 角度为pi时等价于X门（比特翻转）
+        hash_qc.h(i)             # 应用H门（创建叠加）
+    for i in range(HASH_QUBITS - 1):
+        hash_qc.cx(i, i + 1)     # 添加纠缠
+    for i in range(HASH_QUBITS):
+        hash_qc.rx(theta[i], i)  # 输入数据决定的旋转
+    hash_qc.h(range(HASH_QUBITS))  # 最终的哈希步骤
+    hash_qc.measure(range(HASH_QUBITS), range(HASH_QUBITS))
+    
+    return SimpleNamespace(
+        simulator=simulator,
+        rng_circuit=transpile(rng_qc, simulator),
+        hash_circuit=transpile(hash_qc, simulator, optimization_level=3),
+        hash_flips=flips,
+        hash_theta=theta,
+    )
 
 class QuantumRandom:
     """量子随机数生成器类"""
@@ -24,7 +83,7 @@ class QuantumRandom:
     @staticmethod
     def generate_random_bits(num_bits: int = 256) -> str:
         """
-        使用量子电路生成随机比特串
+        生成随机比特串，USE_QUANTUM_SIM为True时使用量子电路
         
         Args:
             num_bits: 要生成的随机比特数量
@@ -32,48 +91,20 @@ class QuantumRandom:
         Returns:
             一个随机的二进制字符串
         """
-        # 每个块的最大量子比特数，避免超过模拟器的限制
-        max_qubits_per_chunk = 16  # 安全值，低于Qiskit模拟器的28比特限制
+        if num_bits <= 0:
+            return ''
         
-        # 初始化结果存储
-        result_bits = ""
+        if not USE_QUANTUM_SIM:
+            return format(secrets.randbits(num_bits), f'0{num_bits}b')
         
-        # 分块生成随机比特
-        remaining_bits = num_bits
-        while remaining_bits > 0:
-            # 计算这个块需要多少比特
-            chunk_size = min(remaining_bits, max_qubits_per_chunk)
-            
-            # 创建量子电路
-            qc = QuantumCircuit(chunk_size, chunk_size)
-            
-            # 将所有量子位置于叠加态
-            for i in range(chunk_size):
-                qc.h(i)
-                
-            # 测量所有量子位
-            qc.measure(range(chunk_size), range(chunk_size))
-            
-            # 在模拟器上执行电路
-            simulator = Aer.get_backend('qasm_simulator')
-            qc_compiled = transpile(qc, simulator)
-            job = simulator.run(qc_compiled, shots=1)
-            result = job.result()
-            counts = result.get_counts(qc)
-            
-            # 获取唯一的测量结果（因为我们只有一个shot）
-            chunk_bitstring = list(counts.keys())[0]
-            
-            # 确保长度正确（考虑到Qiskit可能会移除前导零）
-            chunk_bitstring = chunk_bitstring.zfill(chunk_size)
-            
-            # 追加到结果
-            result_bits += chunk_bitstring
-            
-            # 更新剩余比特数
-            remaining_bits -= chunk_size
+        # 预编译的16比特电路每次测量得到16个随机比特，一次执行所需的全部shot
+        shots = (num_bits + RNG_QUBITS - 1) // RNG_QUBITS
+        quantum = _quantum_circuits()
+        job = quantum.simulator.run(quantum.rng_circuit, shots=max(shots, 1), memory=True)
+        memory = job.result().get_memory()
         
-        return result_bits
+        # 确保长度正确（考虑到Qiskit可能会移除前导零）
+        return ''.join(m.zfill(RNG_QUBITS) for m in memory)[:num_bits]
     
     @staticmethod
     def bitstring_to_hex(bitstring: str) -> str:
@@ -98,68 +129,66 @@ class QuantumHash:
     """量子哈希函数类"""
     
     @staticmethod
-    def quantum_hash(data: str, output_size: int = 64) -> str:
+    def quantum_hash(data: Any, output_size: int = 64) -> str:
         """
-        对输入数据应用量子增强型哈希函数
+        对输入数据应用量子增强型哈希函数，相同输入的结果会被缓存
         
         Args:
-            data: 要哈希的数据
+            data: 要哈希的数据，bytes直接使用，字符串按UTF-8编码，其他类型先序列化为键有序的JSON
             output_size: 输出哈希的位数
             
         Returns:
             哈希字符串（十六进制）
         """
+        if isinstance(data, str):
+            data = data.encode()
+        elif not isinstance(data, (bytes, bytearray)):
+            data = json.dumps(data, sort_keys=True).encode()
+        return QuantumHash._hash_impl(output_size)(bytes(data))
+    
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def _hash_impl(output_size: int):
+        """
+        按输出长度生成专用的（带结果缓存的）哈希函数，首次使用某个长度时生成
+        默认就是数据的SHA-256十六进制摘要（截断到output_size位），常用的64位输出不需要截断；
+        是否使用量子电路也在此时确定，不再逐次判断
+        """
+        if USE_QUANTUM_HASH:
+            return lru_cache(maxsize=4096)(partial(QuantumHash._circuit_hash, output_size=output_size))
+        
+        sha256 = hashlib.sha256
+        if output_size >= 64:
+            def impl(data: bytes) -> str:
+                return sha256(data).hexdigest()
+        else:
+            def impl(data: bytes) -> str:
+                # 只把需要的前几个字节转成十六进制
+                return sha256(data).digest()[:(output_size + 1) // 2].hex()[:output_size]
+        return lru_cache(maxsize=4096)(impl)
+    
+    @staticmethod
+    def _circuit_hash(data: bytes, output_size: int) -> str:
+        """结合量子电路测量分布的哈希计算"""
         # 首先使用传统哈希函数
-        sha256_hash = hashlib.sha256(data.encode()).hexdigest()
+        sha256_hash = hashlib.sha256(data).hexdigest()
         
-        # 使用哈希结果生成量子电路的初始状态
+        # 使用哈希结果生成量子电路的初始状态（是否翻转各量子位）
         seed = int(sha256_hash, 16) % (2**32)
-        np.random.seed(seed)
-        
-        # 创建量子电路 - 使用更小的量子比特数量
-        num_qubits = 8  # 使用8个量子比特，安全地低于Qiskit模拟器的限制
-        qc = QuantumCircuit(num_qubits, num_qubits)
-        
-        # 基于输入数据设置量子电路
-        for i in range(num_qubits):
-            if np.random.random() > 0.5:
-                qc.x(i)  # 应用X门（比特翻转）
-            qc.h(i)      # 应用H门（创建叠加）
-            
-        # 添加纠缠
-        for i in range(num_qubits-1):
-            qc.cx(i, i+1)
-            
-        # 基于原始数据的ASCII值进行额外的门操作
-        for char in data:
-            ascii_val = ord(char)
-            target_qubit = ascii_val % num_qubits
-            
-            # 根据ASCII值选择不同的量子门
-            op_selector = (ascii_val // num_qubits) % 4
-            if op_selector == 0:
-                qc.x(target_qubit)
-            elif op_selector == 1:
-                qc.z(target_qubit)
-            elif op_selector == 2:
-                qc.h(target_qubit)
-            else:
-                if target_qubit < num_qubits - 1:
-                    qc.cx(target_qubit, (target_qubit + 1) % num_qubits)
-                    
-        # 最终的哈希步骤
-        for i in range(num_qubits):
-            qc.h(i)
+        flips = np.where(np.random.RandomState(seed).random_sample(HASH_QUBITS) > 0.5, np.pi, 0.0)
         
-        # 测量
-        qc.measure(range(num_qubits), range(num_qubits))
+        # 基于原始数据的字节值：按字节值对量子位数取模分组求和，换算成旋转角
+        code_points = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+        sums = np.bincount(code_points % HASH_QUBITS, weights=code_points, minlength=HASH_QUBITS)
+        angles = (sums % 256) * (2 * np.pi / 256)
         
-        # 在模拟器上执行电路
-        simulator = Aer.get_backend('qasm_simulator')
-        qc_compiled = transpile(qc, simulator)
-        job = simulator.run(qc_compiled, shots=1024)
+        # 绑定参数后在模拟器上执行预编译的电路
+        quantum = _quantum_circuits()
+        bound = quantum.hash_circuit.assign_parameters(
+            dict(zip(quantum.hash_flips, flips)) | dict(zip(quantum.hash_theta, angles)))
+        job = quantum.simulator.run(bound, shots=1024)
         result = job.result()
-        counts = result.get_counts(qc)
+        counts = result.get_counts()
         
         # 使用测量结果概率分布作为额外的熵源
         probability_string = ""
@@ -181,9 +210,16 @@ class QuantumHash:
         # 截断到所需大小
         return final_hash[:output_size]
 
+# 区块哈希输入的定长头部：索引、时间戳、前一哈希和量子签名的长度；数据部分的规范序列化选项
+_BLOCK_HEADER = struct.Struct('<qdII')
+_DATA_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
 class Block:
     """区块链中的区块类"""
     
+    __slots__ = ("index", "_timestamp", "_timestamp_human", "data",
+                 "previous_hash", "hash", "quantum_signature")
+    
     def __init__(
         self, 
         index: int, 
@@ -207,25 +243,56 @@ class Block:
         self.data = data
         self.previous_hash = previous_hash
         self.quantum_signature = quantum_signature or self._generate_quantum_signature()
-        self.hash = self._calculate_hash()
+        self.hash = self.canonical_hash
+    
+    @property
+    def canonical_hash(self) -> str:
+        """按当前字段（包括数据被原地修改后的内容）重新计算的哈希"""
+        return self._calculate_hash()
+    
+    @property
+    def timestamp(self) -> float:
+        """区块时间戳"""
+        return self._timestamp
+    
+    @timestamp.setter
+    def timestamp(self, value: float) -> None:
+        self._timestamp = value
+        self._timestamp_human = None
+    
+    @property
+    def timestamp_human(self) -> str:
+        """可读的时间字符串，首次访问时计算并缓存"""
+        if self._timestamp_human is None:
+            self._timestamp_human = time.ctime(self._timestamp)
+        return self._timestamp_human
+    
+    @property
+    def tx_list(self) -> tuple:
+        """区块数据中的交易（只保留字典项），每次按当前数据生成"""
+        transactions = self.data.get("transactions") if isinstance(self.data, dict) else None
+        if isinstance(transactions, list):
+            return tuple(tx for tx in transactions if isinstance(tx, dict))
+        return ()
         
     def _generate_quantum_signature(self) -> str:
         """生成区块的量子签名"""
-        # 使用量子随机数生成器创建随机签名
-        return QuantumRandom.generate_random_bits(128)
+        # 签名只是不透明的随机比特串，直接使用密码学安全随机源，不经过量子模拟
+        return format(secrets.randbits(128), '0128b')
     
     def _calculate_hash(self) -> str:
         """计算区块的哈希值，包括量子增强"""
-        block_string = json.dumps({
-            "index": self.index,
-            "timestamp": self.timestamp,
-            "data": self.data,
-            "previous_hash": self.previous_hash,
-            "quantum_signature": self.quantum_signature
-        }, sort_keys=True)
+        # 定长字段直接打包，变长的字符串字段带长度前缀，只有数据部分需要规范序列化（orjson按键排序）
+        previous_hash = self.previous_hash.encode()
+        quantum_signature = self.quantum_signature.encode()
+        buf = bytearray(_BLOCK_HEADER.pack(self.index, self.timestamp,
+                                           len(previous_hash), len(quantum_signature)))
+        buf += previous_hash
+        buf += quantum_signature
+        buf += orjson.dumps(self.data, option=_DATA_OPTIONS)
         
         # 使用我们的量子哈希函数
-        return QuantumHash.quantum_hash(block_string)
+        return QuantumHash.quantum_hash(buf)
     
     def to_dict(self) -> Dict:
         """将区块转换为字典"""
@@ -291,25 +358,36 @@ class QuantumBlockchain:
     
     def is_chain_valid(self) -> bool:
         """验证区块链的完整性"""
+        # 按列取出哈希字段，整体比较列表；全部通过时无需逐块分支
+        hashes = [block.hash for block in self.chain]
+        canonical = [block.canonical_hash for block in self.chain[1:]]
+        previous = [block.previous_hash for block in self.chain[1:]]
+        if hashes[1:] == canonical and previous == hashes[:-1]:
+            return True
+        
+        # 存在无效区块时，再逐块定位第一个出错的位置
         for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i-1]
-            
             # 检查当前区块的哈希是否正确
-            if current_block.hash != current_block._calculate_hash():
+            if hashes[i] != canonical[i-1]:
                 print(f"区块 {i} 的哈希无效")
                 return False
             
             # 检查区块链接是否正确
-            if current_block.previous_hash != previous_block.hash:
+            if previous[i-1] != hashes[i-1]:
                 print(f"区块 {i} 与前一个区块的链接无效")
                 return False
         
         return True
     
     def get_chain_data(self) -> List[Dict]:
-        """获取整个区块链的数据"""
-        return [block.to_dict() for block in self.chain]
+        """获取整个区块链的数据，附带截断后的哈希（hash_short、prev_short）供显示使用"""
+        chain_data = []
+        for block in self.chain:
+            block_data = block.to_dict()
+            block_data["hash_short"] = block.hash[:8]
+            block_data["prev_short"] = block.previous_hash[:8]
+            chain_data.append(block_data)
+        return chain_data
 
 def main():
     """主函数，展示量子区块链的创建和使用"""
@@ -8,16 +8,29 @@
 
 import json
 import time
-import hashlib
 import random
 from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
+from werkzeug.exceptions import BadRequest
+
+from qchain_core import (
+    OrjsonProvider,
+    QuantumBlockchain,
+    batch_items,
+    random_bits,
+    serve,
+    sha256_hex,
+)
 
 app = Flask(__name__, template_folder="../templates", static_folder="../static")
+app.json = OrjsonProvider(app)
 CORS(app)
 
 API_VERSION = "1.0"
 
+# PQEC模拟用的独立伪随机数生成器（非密码学用途），与全局random状态隔离
+_rng = random.Random()
+
 
 def success_response(data, message="success"):
     return {
@@ -39,60 +52,6 @@ def error_response(code, message, data=None):
     }
 
 
-class QuantumBlockchain:
-    def __init__(self):
-        self.chain = []
-        self.create_genesis_block()
-
-    def _quantum_signature(self, bits=256):
-        return "".join(random.choice("0123456789abcdef") for _ in range(bits // 4))
-
-    def _quantum_hash(self, data):
-        classic = hashlib.sha256(str(data).encode()).hexdigest()
-        quantum_part = self._quantum_signature(64)
-        return hashlib.sha256((classic + quantum_part).encode()).hexdigest()
-
-    def create_genesis_block(self):
-        genesis = {
-            "index": 0,
-            "timestamp": str(time.time()),
-            "data": {"message": "量子区块链创世区块", "token": "QTC"},
-            "previous_hash": "0" * 64,
-            "quantum_signature": self._quantum_signature(256),
-            "quantum_proof": "",
-            "hash": self._quantum_hash({"genesis": 0}),
-        }
-        self.chain.append(genesis)
-        return genesis
-
-    def add_block(self, data, quantum_proof=""):
-        prev = self.chain[-1]
-        new_block = {
-            "index": len(self.chain),
-            "timestamp": str(time.time()),
-            "data": data,
-            "previous_hash": prev["hash"],
-            "quantum_signature": self._quantum_signature(256),
-            "quantum_proof": quantum_proof,
-            "hash": self._quantum_hash(
-                {
-                    "index": len(self.chain),
-                    "data": data,
-                    "previous_hash": prev["hash"],
-                    "proof": quantum_proof,
-                }
-            ),
-        }
-        self.chain.append(new_block)
-        return new_block
-
-    def is_valid(self):
-        for i in range(1, len(self.chain)):
-            if self.chain[i]["previous_hash"] != self.chain[i - 1]["hash"]:
-                return False
-        return True
-
-
 class PQECConsensus:
     def __init__(self):
         self.total_proofs = 0
@@ -101,25 +60,34 @@ class PQECConsensus:
         self.difficulty = 3
 
     def mine(self, data, difficulty=3):
+        return self.mine_batch([data], difficulty)[0]
+
+    def mine_batch(self, items, difficulty=3):
+        """批量挖矿：先构造全部证明输入，再在一个循环中统一哈希"""
         start_time = time.time()
         code_types = ["Shor", "Surface", "BitFlip"]
-        code_type = random.choice(code_types)
+        chosen = _rng.choices(code_types, k=len(items))
 
-        base = f"{data}:{time.time()}:{random.random()}"
-        proof = hashlib.sha256(base.encode()).hexdigest()
-        proof = f"{proof}:EC:{difficulty}:{code_type}"
+        # 时间戳部分对整批相同，只格式化一次；证明输入在一个推导式中拼接并哈希
+        suffix = f":{start_time}:"
+        rand = _rng.random
+        digests = [sha256_hex(f"{data}{suffix}{rand()}".encode()) for data in items]
 
         elapsed = time.time() - start_time
-        self.total_proofs += 1
-        self.successful_proofs += 1
+        self.total_proofs += len(items)
+        self.successful_proofs += len(items)
         self.total_time += elapsed
 
-        return {
-            "proof": proof,
-            "code_type": code_type,
-            "difficulty": difficulty,
-            "mining_time": elapsed,
-        }
+        per_item = elapsed / len(items) if items else 0
+        return [
+            {
+                "proof": f"{digest}:EC:{difficulty}:{code_type}",
+                "code_type": code_type,
+                "difficulty": difficulty,
+                "mining_time": per_item,
+            }
+            for digest, code_type in zip(digests, chosen)
+        ]
 
     def verify(self, proof, difficulty):
         return "EC:" + str(difficulty) in proof
@@ -151,8 +119,12 @@ def unified_api():
     params = data.get("params", {})
 
     try:
+        if action in CACHED_ACTIONS:
+            return cached_response(action, params)
         result = handle_action(action, params)
         return jsonify(result)
+    except BadRequest as e:
+        return jsonify(error_response(1, e.description)), 400
     except Exception as e:
         return jsonify(error_response(3, str(e)))
 
@@ -168,12 +140,39 @@ def unified_api_get():
         params = {}
 
     try:
+        if action in CACHED_ACTIONS:
+            return cached_response(action, params)
         result = handle_action(action, params)
         return jsonify(result)
+    except BadRequest as e:
+        return jsonify(error_response(1, e.description)), 400
     except Exception as e:
         return jsonify(error_response(3, str(e)))
 
 
+# 只依赖链内容的查询：按链版本生成弱ETag，未变化时返回304，变化前复用已编码的响应
+CACHED_ACTIONS = ("get_blockchain", "get_blocks")
+
+
+def _encode_untimed(action, params):
+    """编码去掉timestamp字段的响应（JSON对象，以}结尾）"""
+    result = handle_action(action, params)
+    result.pop("timestamp", None)
+    return app.json.dumps_bytes(result)
+
+
+def cached_response(action, params):
+    etag = f'W/"{action}-{blockchain.version}"'
+    if request.headers.get("If-None-Match") == etag:
+        return "", 304, {"ETag": etag}
+    # 缓存的响应体不含timestamp，每次响应时在末尾补上当前时间，避免返回过期的时间戳
+    body = blockchain.encoded(action, lambda: _encode_untimed(action, params))
+    body = body[:-1] + b',"timestamp":%d}' % int(time.time())
+    response = app.response_class(body, mimetype="application/json")
+    response.headers["ETag"] = etag
+    return response
+
+
 def handle_action(action, params):
     # 区块链
     if action == "get_blockchain":
@@ -186,26 +185,26 @@ def handle_action(action, params):
         )
 
     elif action == "get_blocks":
-        blocks = [
-            {
-                "index": b["index"],
-                "timestamp": b["timestamp"],
-                "hash": b["hash"][:16] + "...",
-                "quantum_signature": b["quantum_signature"][:16] + "...",
-                "data": b["data"],
-            }
-            for b in blockchain.chain
-        ]
+        blocks = blockchain.summaries
         return success_response({"blocks": blocks, "count": len(blocks)})
 
     elif action == "get_block":
         index = params.get("index", 0)
         if 0 <= index < len(blockchain.chain):
+            blockchain.record_access(index)
             return success_response(blockchain.chain[index])
         return error_response(2, "Block not found")
 
+    elif action == "get_block_proof":
+        index = params.get("index", 0)
+        if 0 <= index < len(blockchain.chain):
+            proof = blockchain.block_proof(index)
+            proof["hash"] = blockchain.chain[index]["hash"]
+            return success_response(proof)
+        return error_response(2, "Block not found")
+
     elif action == "get_latest_block":
-        return success_response(blockchain.chain[-1])
+        return success_response(blockchain.tip)
 
     elif action == "add_block":
         data = params.get("data", {})
@@ -214,7 +213,12 @@ def handle_action(action, params):
         return success_response({"block": block}, "Block added")
 
     elif action == "validate_chain":
-        return success_response({"valid": blockchain.is_valid()})
+        return success_response(
+            {
+                "valid": blockchain.is_valid(),
+                "merkle_root": blockchain.merkle_root.hex(),
+            }
+        )
 
     # 交易
     elif action == "get_transactions":
@@ -248,6 +252,23 @@ def handle_action(action, params):
             }
         )
 
+    elif action == "pqec_mine_batch":
+        items = batch_items(params)
+        difficulty = params.get("difficulty", 3)
+        results = pqec.mine_batch(items, difficulty)
+        blocks = [
+            blockchain.add_block({"transaction": data, "proof": r["proof"]}, r["proof"])
+            for data, r in zip(items, results)
+        ]
+        return success_response(
+            {
+                "blocks": blocks,
+                "proofs": [r["proof"] for r in results],
+                "count": len(blocks),
+                "difficulty": difficulty,
+            }
+        )
+
     elif action == "pqec_verify":
         proof = params.get("proof", "")
         difficulty = params.get("difficulty", 3)
@@ -282,7 +303,7 @@ def handle_action(action, params):
         prob = params.get("error_probability", 0.1)
         qubits = {"Shor": 9, "Surface": 17, "BitFlip": 3}
         n = qubits.get(code, 3)
-        original = "".join(random.choice("01") for _ in range(n))
+        original = random_bits(n)
         corrected = original
         return success_response(
             {
@@ -307,17 +328,14 @@ def handle_action(action, params):
 
     elif action == "quantum_random":
         bits = params.get("bits", 64)
-        r = "".join(random.choice("01") for _ in range(bits))
+        r = random_bits(bits)
         return success_response({"bits": r, "hex": hex(int(r, 2))[2:]})
 
     # 搜索
     elif action == "search":
         query = params.get("query", "")
-        results = {"blocks": [], "transactions": []}
-        for b in blockchain.chain:
-            if str(b["index"]) == query or query in str(b["hash"]):
-                results["blocks"].append({"index": b["index"], "hash": b["hash"]})
-        return success_response(results)
+        # 本服务的搜索只返回区块，transactions保持为空列表
+        return success_response(blockchain.search(query, blocks_only=True))
 
     else:
         return error_response(1, f"Unknown action: {action}")
@@ -355,4 +373,4 @@ if __name__ == "__main__":
     print("API入口: POST /api/v1/query")
     print("运行: http://127.0.0.1:9000")
     print("=" * 50)
-    app.run(host="0.0.0.0", port=9000, debug=True)
+    serve(app)
@@ -6,16 +6,20 @@ PQEC (Post-Quantum Error Correction) Flask API
 量子纠错区块链专用API端点
 """
 
-import json
 import time
 import hashlib
-import random
+import secrets
 import math
-from collections import deque
+import threading
+from functools import lru_cache
+import orjson
+import numpy as np
 from datetime import datetime
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
+from qchain_core import OrjsonProvider, serve
+
 try:
     import qsharp
     from qsharp import Result
@@ -25,18 +29,109 @@ except ImportError:
     QSHARP_AVAILABLE = False
     print("警告: qsharp包未安装，将使用Python模拟量子计算")
 
+# 哈希与证明用到的Q#入口在首次使用时编译一次，之后热路径中只调用
+_QSHARP_PROGRAM = """
+    open QuantumBlockchain.QHash;
+    open QuantumBlockchain.QRNG;
+    operation GetHybridHash(data : String) : String {
+        return HybridHash(data, 64);
+    }
+    operation GetQuantumProof() : String {
+        return GenerateQuantumSignature();
+    }
+"""
+
+_QSHARP_READY = False
+_qsharp_attempted = not QSHARP_AVAILABLE
+_qsharp_lock = threading.Lock()
+
+
+def _compile_qsharp_once() -> bool:
+    """编译Q#程序（只尝试一次），返回是否可以调用Q#入口"""
+    global _QSHARP_READY, _qsharp_attempted
+    if _qsharp_attempted:
+        return _QSHARP_READY
+    with _qsharp_lock:
+        if not _qsharp_attempted:
+            try:
+                qsharp.compile(_QSHARP_PROGRAM)
+                _QSHARP_READY = True
+            except Exception as e:
+                print(f"警告: Q#程序编译失败，将使用Python模拟量子计算: {e}")
+            _qsharp_attempted = True
+    return _QSHARP_READY
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 
+# 空的SHA-256状态：复制它比每次新建哈希对象开销更小
+_SHA256 = hashlib.sha256()
+
+
+# 各难度对应的摘要高位掩码（难度为十六进制前导零的个数，最多64位）
+_TARGET_MASKS = {d: ((1 << (4 * d)) - 1) << (256 - 4 * d) for d in range(65)}
+# 各难度对应的目标前缀字符串，供验证结果说明使用
+_TARGET_PREFIX = {d: "0" * d for d in range(65)}
+
+# 创世区块的前一哈希
+_GENESIS_PREV_HASH = "0" * 64
+
+# 参与区块哈希的字段
+_HASHED_FIELDS = ("index", "timestamp", "data", "previous_hash", "proof")
+
+# 值不可变的data类型：字段元组相等即说明区块内容未变，可以沿用缓存的序列化结果
+_IMMUTABLE_DATA = (str, int, float, bool, type(None))
+
+
+def sha256_hex(data: bytes) -> str:
+    """SHA-256十六进制摘要，从预先创建的空状态复制"""
+    h = _SHA256.copy()
+    h.update(data)
+    return h.hexdigest()
+
+
+class RollingWindow:
+    """固定容量的滑动窗口：环形缓冲区加运行总和，追加与求平均都是O(1)"""
+
+    __slots__ = ("_buf", "_head", "_count", "_total")
+
+    def __init__(self, capacity: int):
+        self._buf = [0] * capacity
+        self._head = 0
+        self._count = 0
+        self._total = 0
+
+    def append(self, value) -> None:
+        buf = self._buf
+        if self._count == len(buf):
+            self._total -= buf[self._head]
+        else:
+            self._count += 1
+        buf[self._head] = value
+        self._total += value
+        self._head = (self._head + 1) % len(buf)
+        if self._head == 0:
+            # 每绕一圈按缓冲区重新求和一次，避免浮点累计误差
+            self._total = sum(buf[: self._count])
+
+    def __len__(self) -> int:
+        return self._count
+
+    def mean(self) -> float:
+        return self._total / self._count if self._count else 0
+
+
 class PQECStats:
     """PQEC统计信息收集器"""
 
     def __init__(self):
         self.total_proofs = 0
         self.successful_proofs = 0
-        self.mining_times = deque(maxlen=100)
-        self.verification_results = deque(maxlen=100)
+        self.mining_times = RollingWindow(100)
+        self.verification_results = RollingWindow(100)
         self.total_blocks = 0
 
     def add_mining_time(self, mining_time: float):
@@ -48,17 +143,11 @@ class PQECStats:
         self.verification_results.append(valid)
 
     def get_stats(self):
-        avg_mining = (
-            sum(self.mining_times) / len(self.mining_times) if self.mining_times else 0
-        )
+        avg_mining = self.mining_times.mean()
         success_rate = (
             self.successful_proofs / self.total_proofs if self.total_proofs > 0 else 0
         )
-        verif_rate = (
-            sum(self.verification_results) / len(self.verification_results)
-            if self.verification_results
-            else 0
-        )
+        verif_rate = self.verification_results.mean()
 
         return {
             "total_proofs": self.total_proofs,
@@ -68,6 +157,48 @@ class PQECStats:
         }
 
 
+MASK64 = (1 << 64) - 1
+
+
+class FastRng:
+    """xorshift64*伪随机数生成器：只用于纠错模拟中的错误注入，不用于密码学用途"""
+
+    __slots__ = ("s",)
+
+    def __init__(self, seed: int = 0):
+        self.s = (seed & MASK64) or 0x9E3779B97F4A7C15
+
+    def next64(self) -> int:
+        s = self.s
+        s ^= s >> 12
+        s ^= (s << 25) & MASK64
+        s ^= s >> 27
+        self.s = s
+        return (s * 0x2545F4914F6CDD1D) & MASK64
+
+    def uniform(self) -> float:
+        """[0, 1) 均匀分布，取高53位"""
+        return (self.next64() >> 11) * 1.1102230246251565e-16
+
+    def below(self, n: int) -> int:
+        """[0, n) 的整数（乘法移位映射）"""
+        return (self.next64() * n) >> 64
+
+
+_rng = FastRng(secrets.randbits(64))
+_np_rng = np.random.default_rng()
+
+# 去极化噪声：前3个比特各以0.1的概率出错，出错时X/Y/Z等概率，只有X翻转比特，
+# 即每比特以1/30的概率翻转；每个比特用一个随机字的21位与阈值比较
+_DEPOLARIZING_BITS = 21
+_DEPOLARIZING_FLIP_THRESHOLD = round((1 << _DEPOLARIZING_BITS) * 0.1 / 3)
+
+
+def _flip_bit(state: str, i: int) -> str:
+    """翻转比特串中的第i位（切片拼接，不展开为字符列表）"""
+    return state[:i] + ("1" if state[i] == "0" else "0") + state[i + 1 :]
+
+
 class QuantumErrorCorrection:
     """量子纠错码模拟器"""
 
@@ -79,13 +210,11 @@ class QuantumErrorCorrection:
         original = state
         corrected = state
 
-        if random.random() < error_prob:
-            error_type = random.choice(["bit_flip", "phase_flip"])
-            if error_type == "bit_flip":
-                bits = list(corrected)
-                bit_idx = random.randint(0, len(bits) - 1)
-                bits[bit_idx] = "1" if bits[bit_idx] == "0" else "0"
-                corrupted = "".join(bits)
+        if _rng.uniform() < error_prob:
+            word = _rng.next64()
+            if word & 1:
+                bit_idx = ((word >> 1) * len(corrected)) >> 63
+                corrupted = _flip_bit(corrected, bit_idx)
             else:
                 corrupted = corrected + "E"
 
@@ -105,7 +234,7 @@ class QuantumErrorCorrection:
         original = state
         corrected = state
 
-        if random.random() < error_prob:
+        if _rng.uniform() < error_prob:
             corrupted = QuantumErrorCorrection._apply_depolarizing_error(state)
             correction = QuantumErrorCorrection._syndrome_detection(
                 corrupted, "Surface"
@@ -125,41 +254,41 @@ class QuantumErrorCorrection:
         original = state
         corrupted = state
 
-        if random.random() < error_prob:
-            bits = list(corrupted)
-            error_positions = []
-            for i in range(len(bits)):
-                if random.random() < error_prob:
-                    bits[i] = "1" if bits[i] == "0" else "0"
-                    error_positions.append(i)
-            corrupted = "".join(bits)
+        if _rng.uniform() < error_prob:
+            # 比特串转为0/1数组，一次抽取全部比特的出错掩码并异或
+            bits = np.frombuffer(corrupted.encode(), dtype=np.uint8) - ord("0")
+            errors = (_np_rng.random(bits.size) < error_prob).astype(np.uint8)
+            bits ^= errors
+            error_positions = np.flatnonzero(errors).tolist()
+            corrupted = (bits + ord("0")).astype(np.uint8).tobytes().decode()
 
             corrected = QuantumErrorCorrection._bitflip_decode(
                 corrupted, error_positions
             )
             return original, corrected, True
 
-        return original, corrected, True
+        return original, corrupted, True
 
     @staticmethod
     def _apply_depolarizing_error(state: str) -> str:
         """去极化噪声模型"""
-        error_ops = ["X", "Y", "Z", "I"]
-        result = list(state)
-        for i in range(min(len(result), 3)):
-            if random.random() < 0.1:
-                op = random.choice(error_ops[:-1])
-                if op == "X":
-                    result[i] = "1" if result[i] == "0" else "0"
-        return "".join(result)
+        word = _rng.next64()
+        mask = (1 << _DEPOLARIZING_BITS) - 1
+        # 只为实际翻转的比特生成新字符串，大多数情况下原样返回
+        for i in range(min(len(state), 3)):
+            if (word >> (i * _DEPOLARIZING_BITS)) & mask < _DEPOLARIZING_FLIP_THRESHOLD:
+                state = _flip_bit(state, i)
+        return state
 
     @staticmethod
     def _syndrome_detection(state: str, code_type: str) -> dict:
         """syndrome检测"""
         if code_type == "Shor":
-            return {"parity_x": random.randint(0, 1), "parity_z": random.randint(0, 1)}
+            word = _rng.next64()
+            return {"parity_x": word & 1, "parity_z": (word >> 1) & 1}
         elif code_type == "Surface":
-            return {"stabilizers": [random.randint(0, 1) for _ in range(4)]}
+            word = _rng.next64()
+            return {"stabilizers": [(word >> i) & 1 for i in range(4)]}
         elif code_type == "BitFlip":
             return {"syndrome": sum(1 for c in state if c == "1") % 2}
         return {}
@@ -209,6 +338,11 @@ class PQECBlockchain:
     def __init__(self):
         self.chain = []
         self.difficulty = 3
+        # 各区块追加时记录的哈希原像：(字段元组, 哈希, 规范序列化, 量子部分)，
+        # 验证时不再重新调用Q#（量子部分含测量熵，重新计算的结果与入链时不同）
+        self._preimages = []
+        # 写锁：多线程服务下保证新区块按顺序链接到链尾
+        self._lock = threading.Lock()
         self.create_genesis_block()
 
     def create_genesis_block(self):
@@ -217,99 +351,137 @@ class PQECBlockchain:
             "index": 0,
             "timestamp": time.time(),
             "data": "PQEC Genesis Block",
-            "previous_hash": "0" * 64,
+            "previous_hash": _GENESIS_PREV_HASH,
             "proof": self._generate_proof(0),
             "hash": "",
         }
-        genesis_block["hash"] = self._calculate_hash(genesis_block)
-        self.chain.append(genesis_block)
+        self._append_block(genesis_block)
         return genesis_block
 
+    def _append_block(self, block: dict) -> None:
+        """计算哈希并追加区块，同时记录哈希原像供验证使用"""
+        block_data = self._serialize(block)
+        quantum_part = self._quantum_part(block_data)
+        block["hash"] = self._calculate_hash(block_data, quantum_part)
+        self._preimages.append(
+            (
+                tuple(block[k] for k in _HASHED_FIELDS),
+                block["hash"],
+                block_data,
+                quantum_part,
+            )
+        )
+        self.chain.append(block)
+
     def _generate_proof(self, index: int) -> str:
         """生成工作量证明"""
-        random.seed(index + int(time.time()))
-        proof_bits = "".join(random.choice("01") for _ in range(256))
-        return hex(int(proof_bits, 2))[2:].zfill(64)
+        return secrets.token_hex(32)
 
-    def _calculate_hash(self, block: dict) -> str:
-        block_data = json.dumps(
-            {
-                "index": block["index"],
-                "timestamp": block["timestamp"],
-                "data": block["data"],
-                "previous_hash": block["previous_hash"],
-                "proof": block["proof"],
-            },
-            sort_keys=True,
+    def _serialize(self, block: dict) -> bytes:
+        """区块哈希输入的规范JSON（orjson直接输出UTF-8字节）"""
+        return orjson.dumps(
+            {k: block[k] for k in _HASHED_FIELDS}, option=orjson.OPT_SORT_KEYS
         )
 
-        if QSHARP_AVAILABLE:
+    def _quantum_part(self, block_data: bytes) -> str:
+        """哈希的量子部分：Q#可用时为HybridHash（含测量熵），否则为经典摘要的前16位"""
+        if _compile_qsharp_once():
             try:
-                qsharp.compile("""
-                    open QuantumBlockchain.QHash;
-                    operation GetHybridHash(data : String) : String {
-                        return HybridHash(data, 64);
-                    }
-                """)
-                quantum_part = qsharp.call(
-                    "QuantumBlockchain.QHash.HybridHash", block_data, 64
+                return qsharp.call(
+                    "QuantumBlockchain.QHash.HybridHash", block_data.decode(), 64
                 )
             except:
-                quantum_part = hashlib.sha256(block_data.encode()).hexdigest()[:16]
-        else:
-            quantum_part = hashlib.sha256(block_data.encode()).hexdigest()[:16]
-
-        classical_part = hashlib.sha256(
-            (block_data + quantum_part).encode()
-        ).hexdigest()
-        return classical_part
+                pass
+        return sha256_hex(block_data)[:16]
+
+    def _calculate_hash(self, block_data: bytes, quantum_part: str) -> str:
+        h = _SHA256.copy()
+        h.update(block_data)
+        h.update(quantum_part.encode())
+        return h.hexdigest()
+
+    def _draw_proofs(self, count: int) -> list:
+        """生成count个区块证明：Q#可用时逐个调用，否则一次取出全部随机字节再切分"""
+        if _compile_qsharp_once():
+            proofs = []
+            for _ in range(count):
+                try:
+                    proofs.append(
+                        qsharp.call("QuantumBlockchain.QRNG.GenerateQuantumSignature")
+                    )
+                except:
+                    proofs.append(self._generate_proof(len(self.chain)))
+            return proofs
+        entropy = secrets.token_bytes(32 * count).hex()
+        return [entropy[i : i + 64] for i in range(0, 64 * count, 64)]
 
     def mine_block(self, data: str, difficulty: int = 3) -> dict:
         """挖矿新区块"""
-        start_time = time.time()
-
-        previous_block = self.chain[-1]
-
-        if QSHARP_AVAILABLE:
-            try:
-                qsharp.compile("""
-                    open QuantumBlockchain.QRNG;
-                    operation GetQuantumProof() : String {
-                        return GenerateQuantumSignature();
+        return self.mine_batch([data], difficulty)[0]
+
+    def mine_batch(self, items: list, difficulty: int = 3) -> list:
+        """批量挖矿：先一次生成全部证明，再在锁内依次链接并追加区块"""
+        mark = time.time()
+        proofs = self._draw_proofs(len(items))
+
+        results = []
+        with self._lock:
+            for data, proof in zip(items, proofs):
+                # 与单个挖矿一样，每个区块在创建时读取时钟
+                new_block = {
+                    "index": len(self.chain),
+                    "timestamp": time.time(),
+                    "data": data,
+                    "previous_hash": self.chain[-1]["hash"],
+                    "proof": proof,
+                    "hash": "",
+                }
+                self._append_block(new_block)
+                # 每个区块的挖矿时间从上一个区块完成时算起（第一个区块包含生成证明的时间）
+                now = time.time()
+                results.append(
+                    {
+                        "block": new_block,
+                        "proof": proof,
+                        "mining_time": round(now - mark, 4),
                     }
-                """)
-                proof = qsharp.call("QuantumBlockchain.QRNG.GenerateQuantumSignature")
-            except:
-                proof = self._generate_proof(len(self.chain))
-        else:
-            proof = self._generate_proof(len(self.chain))
-
-        new_block = {
-            "index": len(self.chain),
-            "timestamp": time.time(),
-            "data": data,
-            "previous_hash": previous_block["hash"],
-            "proof": proof,
-            "hash": "",
-        }
-        new_block["hash"] = self._calculate_hash(new_block)
+                )
+                mark = now
 
-        self.chain.append(new_block)
+        return results
 
-        mining_time = time.time() - start_time
+    def is_chain_valid(self) -> bool:
+        """验证区块链：检查链接关系，并用入链时记录的量子部分校验各区块当前字段的哈希"""
+        hashes = [block["hash"] for block in self.chain]
+        if [block["previous_hash"] for block in self.chain[1:]] != hashes[:-1]:
+            return False
 
-        return {
-            "block": new_block,
-            "proof": proof,
-            "mining_time": round(mining_time, 4),
-        }
+        for block, (fields, block_hash, block_data, quantum_part) in zip(
+            self.chain, self._preimages
+        ):
+            unchanged = isinstance(block["data"], _IMMUTABLE_DATA) and fields == tuple(
+                block[k] for k in _HASHED_FIELDS
+            )
+            if unchanged:
+                # 字段与哈希都未变时入链时的哈希依然成立，无需重新序列化和计算
+                if block["hash"] == block_hash:
+                    continue
+            else:
+                block_data = self._serialize(block)
+            if self._calculate_hash(block_data, quantum_part) != block["hash"]:
+                return False
+        return True
 
     def verify_proof(self, proof: str, difficulty: int = 3) -> dict:
         """验证工作量证明"""
-        proof_hash = hashlib.sha256(proof.encode()).hexdigest()
+        h = _SHA256.copy()
+        h.update(proof.encode())
+        digest = h.digest()
 
-        target = "0" * difficulty
-        is_valid = proof_hash[:difficulty] == target
+        # 难度d要求十六进制摘要前d位为0，即摘要最高4d位为0，用预先计算的掩码整数比较
+        mask = _TARGET_MASKS.get(difficulty)
+        is_valid = mask is not None and int.from_bytes(digest, "big") & mask == 0
+        target = _TARGET_PREFIX[difficulty] if mask is not None else "0" * difficulty
 
         if QSHARP_AVAILABLE:
             qec_result = "量子纠错验证通过" if is_valid else "验证失败"
@@ -318,7 +490,7 @@ class PQECBlockchain:
 
         return {
             "valid": is_valid,
-            "proof_hash": proof_hash[:16] + "...",
+            "proof_hash": digest[:8].hex() + "...",
             "details": f"难度: {difficulty}, 目标前缀: {target}, {qec_result}",
         }
 
@@ -327,6 +499,32 @@ pqec_blockchain = PQECBlockchain()
 pqec_stats = PQECStats()
 
 
+# 只读端点的响应体按状态缓存：链只会追加区块，链长即可作为版本号
+def _json_body(body: bytes):
+    return app.response_class(body, mimetype="application/json")
+
+
+_CODES_JSON = app.json.dumps_bytes(QuantumErrorCorrection.SUPPORTED_CODES)
+
+
+@lru_cache(maxsize=1)
+def _status_body(length: int, difficulty: int) -> bytes:
+    return app.json.dumps_bytes(
+        {
+            "difficulty": difficulty,
+            "total_blocks": length,
+            "qec_enabled": True,
+            "qsharp_available": QSHARP_AVAILABLE,
+            "supported_codes": QuantumErrorCorrection.SUPPORTED_CODES,
+        }
+    )
+
+
+def _chain_body(chain: list) -> bytes:
+    # 每次按区块当前内容编码，区块被修改后不会返回旧的字节
+    return app.json.dumps_bytes({"chain": chain, "length": len(chain)})
+
+
 @app.route("/api/pqec/mine", methods=["POST"])
 def mine_block():
     """挖矿端点 - 挖矿新区块"""
@@ -356,17 +554,40 @@ def mine_block():
         return jsonify({"error": f"挖矿失败: {str(e)}"}), 500
 
 
+@app.route("/api/pqec/mine-batch", methods=["POST"])
+def mine_batch():
+    """批量挖矿端点 - 一次挖出多个区块"""
+    try:
+        data = request.get_json()
+
+        if not data or not isinstance(data.get("items"), list):
+            return jsonify({"error": "缺少items列表"}), 400
+
+        difficulty = data.get("difficulty", 3)
+
+        results = pqec_blockchain.mine_batch(data["items"], difficulty)
+
+        for result in results:
+            pqec_stats.add_mining_time(result["mining_time"])
+        pqec_stats.total_blocks += len(results)
+
+        return jsonify(
+            {
+                "blocks": [result["block"] for result in results],
+                "proofs": [result["proof"] for result in results],
+                "count": len(results),
+            }
+        )
+
+    except Exception as e:
+        return jsonify({"error": f"批量挖矿失败: {str(e)}"}), 500
+
+
 @app.route("/api/pqec/status", methods=["GET"])
 def get_status():
     """状态端点 - 获取PQEC状态"""
-    return jsonify(
-        {
-            "difficulty": pqec_blockchain.difficulty,
-            "total_blocks": len(pqec_blockchain.chain),
-            "qec_enabled": True,
-            "qsharp_available": QSHARP_AVAILABLE,
-            "supported_codes": QuantumErrorCorrection.SUPPORTED_CODES,
-        }
+    return _json_body(
+        _status_body(len(pqec_blockchain.chain), pqec_blockchain.difficulty)
     )
 
 
@@ -395,7 +616,7 @@ def verify_proof():
 @app.route("/api/pqec/codes", methods=["GET"])
 def get_error_codes():
     """纠错码端点 - 获取支持的纠错码列表"""
-    return jsonify(QuantumErrorCorrection.SUPPORTED_CODES)
+    return _json_body(_CODES_JSON)
 
 
 @app.route("/api/pqec/simulate-error", methods=["POST"])
@@ -439,9 +660,7 @@ def get_stats():
 @app.route("/api/pqec/chain", methods=["GET"])
 def get_chain():
     """获取完整区块链"""
-    return jsonify(
-        {"chain": pqec_blockchain.chain, "length": len(pqec_blockchain.chain)}
-    )
+    return _json_body(_chain_body(pqec_blockchain.chain))
 
 
 @app.route("/api/pqec/block/<int:block_index>", methods=["GET"])
@@ -452,6 +671,17 @@ def get_block(block_index):
     return jsonify({"error": "区块不存在"}), 404
 
 
+@app.route("/api/pqec/validate", methods=["GET"])
+def validate_chain():
+    """验证完整区块链"""
+    return jsonify(
+        {
+            "valid": pqec_blockchain.is_chain_valid(),
+            "length": len(pqec_blockchain.chain),
+        }
+    )
+
+
 @app.route("/api/pqec/health", methods=["GET"])
 def health_check():
     """健康检查端点"""
@@ -474,4 +704,4 @@ if __name__ == "__main__":
     print("访问 http://127.0.0.1:9001")
     print("=" * 50)
 
-    app.run(host="0.0.0.0", port=9001, debug=True)
+    serve(app, port=9001)
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+量子区块链核心：区块链数据结构与哈希、Merkle证明等辅助函数
+app.py 与 unified_api.py 共用
+"""
+
+import os
+import time
+import hashlib
+import secrets
+import threading
+import orjson
+import heapq
+from collections import Counter, defaultdict
+from flask.json.provider import JSONProvider
+from werkzeug.exceptions import BadRequest
+
+
+def _hex_bytes(obj):
+    """orjson的default钩子：内部以原始字节保存的字段在API边界转为十六进制"""
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.hex()
+    raise TypeError
+
+
+class OrjsonProvider(JSONProvider):
+    """使用orjson作为Flask的JSON序列化后端"""
+
+    def dumps_bytes(self, obj) -> bytes:
+        return orjson.dumps(obj, default=_hex_bytes, option=orjson.OPT_NON_STR_KEYS)
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj).decode()
+
+    def response(self, *args, **kwargs):
+        # jsonify直接使用orjson输出的字节作为响应体，不经过str解码再编码
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self.dumps_bytes(obj), mimetype="application/json"
+        )
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+# 热点区块证明：按访问次数取前HOT_BLOCKS个区块构建Huffman形状的辅助树，
+# 每新增HOT_REBUILD_INTERVAL个区块重建一次
+HOT_BLOCKS = 32
+HOT_REBUILD_INTERVAL = 64
+
+# 假定有效高度：低于该高度的区块不再重新验证链接，可用环境变量预设；
+# 每次验证成功后推进到链长减去安全深度，最新的几个区块总会被重新检查
+ASSUME_VALID_BELOW = int(os.environ.get("QCHAIN_ASSUME_VALID_BELOW", "0"))
+ASSUME_VALID_DEPTH = 6
+
+# 创世区块的前一哈希
+GENESIS_PREV_HASH = "0" * 64
+
+
+# 空的SHA-256状态：复制它比每次新建哈希对象开销更小
+_SHA256 = hashlib.sha256()
+
+
+def sha256_hex(data: bytes) -> str:
+    """SHA-256十六进制摘要，从预先创建的空状态复制"""
+    h = _SHA256.copy()
+    h.update(data)
+    return h.hexdigest()
+
+
+def merkle_proof(layers, position):
+    """根据Merkle各层生成包含证明（兄弟节点列表）"""
+    proof = []
+    for level in layers[:-1]:
+        sibling = position ^ 1
+        proof.append(level[sibling] if sibling < len(level) else level[position])
+        position //= 2
+    return proof
+
+
+def verify_merkle_proof(leaf, position, proof, root) -> bool:
+    """验证Merkle包含证明"""
+    node = leaf
+    for sibling in proof:
+        if position % 2:
+            node = hashlib.sha256(sibling + node).digest()
+        else:
+            node = hashlib.sha256(node + sibling).digest()
+        position //= 2
+    return node == root
+
+
+def build_huffman_proofs(weighted_leaves):
+    """
+    按访问频率构建Huffman形状的Merkle树：访问越多的叶子离根越近，证明越短
+    返回根摘要和各叶子的证明（[兄弟节点十六进制, 兄弟所在侧] 列表，自底向上）
+    """
+    heap = []
+    for seq, (key, weight, leaf) in enumerate(weighted_leaves):
+        heap.append((weight, seq, leaf, [key]))
+    heapq.heapify(heap)
+    proofs = {key: [] for key, _, _ in weighted_leaves}
+    seq = len(heap)
+    while len(heap) > 1:
+        w1, _, left, left_keys = heapq.heappop(heap)
+        w2, _, right, right_keys = heapq.heappop(heap)
+        for key in left_keys:
+            proofs[key].append([right.hex(), "right"])
+        for key in right_keys:
+            proofs[key].append([left.hex(), "left"])
+        parent = hashlib.sha256(left + right).digest()
+        heapq.heappush(heap, (w1 + w2, seq, parent, left_keys + right_keys))
+        seq += 1
+    return heap[0][2], proofs
+
+
+def batch_items(params):
+    """取出pqec_mine_batch的items参数，不是非空字符串列表时抛出BadRequest"""
+    items = params.get("items")
+    if (
+        not isinstance(items, list)
+        or not items
+        or not all(isinstance(item, str) for item in items)
+    ):
+        raise BadRequest("items必须是非空的字符串列表")
+    return items
+
+
+def random_bits(num_bits: int) -> str:
+    """生成指定长度的随机二进制字符串，一次取出全部随机比特"""
+    if num_bits <= 0:
+        return ""
+    return format(secrets.randbits(num_bits), f"0{num_bits}b")
+
+
+class QuantumBlockchain:
+    def __init__(self, genesis_message="量子区块链创世区块"):
+        self.chain = []
+        self.pending_transactions = []
+        self.genesis_message = genesis_message
+        # 搜索索引：数据值中出现的词 -> 区块索引，只用于缩小候选区块
+        self._inverted = defaultdict(set)
+        # get_blocks返回的区块摘要，区块追加时生成一次
+        self._summaries = []
+        # 区块哈希上的增量Merkle树（每层为原始摘要列表）
+        self._merkle_levels = []
+        self.assume_valid_height = ASSUME_VALID_BELOW
+        # 区块访问计数，以及热点区块的辅助树根和预先生成的证明
+        self._access_count = Counter()
+        self._hot_root = None
+        self._proof_cache = {}
+        # 链尾区块及其哈希，追加区块时更新，读取链尾无需索引chain
+        self.tip = None
+        self._tip_hash = None
+        # 链版本号（每追加一个区块加一），以及按该版本缓存的已编码响应
+        self._version = 0
+        self._encoded = {}
+        # 写锁：多线程服务下保证新区块按顺序链接到链尾
+        self._lock = threading.Lock()
+        self.create_genesis_block()
+
+    def _quantum_signature(self, bits=256):
+        n = max(bits // 4, 0)
+        return secrets.token_hex((n + 1) // 2)[:n]
+
+    def _quantum_hash(self, data):
+        # 经典部分与量子部分（32个随机字节）写入同一个哈希状态，数据只吸收一次
+        h = _SHA256.copy()
+        h.update(str(data).encode())
+        h.update(secrets.token_bytes(32))
+        return h.hexdigest()
+
+    def create_genesis_block(self):
+        genesis = {
+            "index": 0,
+            "timestamp": time.time(),
+            "data": {"message": self.genesis_message, "token": "QTC"},
+            "previous_hash": GENESIS_PREV_HASH,
+            "quantum_signature": secrets.token_bytes(32),
+            "quantum_proof": "",
+            "hash": self._quantum_hash({"genesis": 0}),
+        }
+        self._append(genesis)
+        return genesis
+
+    def add_block(self, data, quantum_proof=""):
+        with self._lock:
+            prev_hash = self._tip_hash
+            new_block = {
+                "index": len(self.chain),
+                "timestamp": time.time(),
+                "data": data,
+                "previous_hash": prev_hash,
+                "quantum_signature": secrets.token_bytes(32),
+                "quantum_proof": quantum_proof,
+                "hash": self._quantum_hash(
+                    {
+                        "index": len(self.chain),
+                        "data": data,
+                        "previous_hash": prev_hash,
+                        "proof": quantum_proof,
+                    }
+                ),
+            }
+            self._append(new_block)
+            if len(self.chain) % HOT_REBUILD_INTERVAL == 0:
+                self._rebuild_hot_proofs()
+            return new_block
+
+    def _append(self, block):
+        self.chain.append(block)
+        self.tip = block
+        self._tip_hash = block["hash"]
+        self._index_block(block)
+        self._version += 1
+
+    @property
+    def version(self):
+        return self._version
+
+    def encoded(self, key, build):
+        # 同一链版本下只编码一次，build返回编码后的字节
+        version = self._version
+        hit = self._encoded.get(key)
+        if hit is None or hit[0] != version:
+            hit = self._encoded[key] = (version, build())
+        return hit[1]
+
+    def record_access(self, idx):
+        self._access_count[idx] += 1
+
+    def _rebuild_hot_proofs(self):
+        hot = self._access_count.most_common(HOT_BLOCKS)
+        if len(hot) < 2:
+            self._hot_root, self._proof_cache = None, {}
+            return
+        leaves = [(i, n, bytes.fromhex(self.chain[i]["hash"])) for i, n in hot]
+        self._hot_root, self._proof_cache = build_huffman_proofs(leaves)
+
+    def block_proof(self, idx):
+        # 热点区块直接返回缓存的短证明，其余区块沿完整Merkle树生成证明
+        if idx in self._proof_cache:
+            return {
+                "root": self._hot_root.hex(),
+                "proof": self._proof_cache[idx],
+                "tree": "hot",
+            }
+        proof = []
+        position = idx
+        for sibling in merkle_proof(self._merkle_levels, idx):
+            proof.append([sibling.hex(), "left" if position % 2 else "right"])
+            position //= 2
+        return {"root": self.merkle_root.hex(), "proof": proof, "tree": "full"}
+
+    @property
+    def summaries(self):
+        return self._summaries
+
+    @property
+    def merkle_root(self):
+        return self._merkle_levels[-1][0]
+
+    def _merkle_append(self, leaf):
+        # 只沿最右侧路径更新，每个新区块 O(log N) 次哈希；奇数层复制最后一个节点
+        levels = self._merkle_levels
+        if not levels:
+            levels.append([])
+        levels[0].append(leaf)
+        position = len(levels[0]) - 1
+        level = 0
+        while len(levels[level]) > 1:
+            nodes = levels[level]
+            left = nodes[position & ~1]
+            right = nodes[position | 1] if position | 1 < len(nodes) else left
+            if level + 1 == len(levels):
+                levels.append([])
+            position //= 2
+            parent = hashlib.sha256(left + right).digest()
+            if position < len(levels[level + 1]):
+                levels[level + 1][position] = parent
+            else:
+                levels[level + 1].append(parent)
+            level += 1
+
+    def _index_block(self, block):
+        idx = block["index"]
+        self._summaries.append(
+            {
+                "index": idx,
+                "timestamp": block["timestamp"],
+                "hash": block["hash"][:16] + "...",
+                "quantum_signature": block["quantum_signature"][:8].hex() + "...",
+                "data": block["data"],
+            }
+        )
+        digest = bytes.fromhex(block["hash"])
+        self._merkle_append(digest)
+        values = block["data"].values() if isinstance(block["data"], dict) else ()
+        for v in values:
+            for token in str(v).lower().split():
+                self._inverted[token].add(idx)
+
+    def search(self, query, blocks_only=False):
+        """按索引/哈希子串搜索区块，并在区块数据中做不区分大小写的子串搜索
+
+        blocks_only为True时只搜索区块，transactions始终为空列表（host/app.py的响应格式）
+        """
+        found = {
+            b["index"]
+            for b in self.chain
+            if str(b["index"]) == query or query in str(b["hash"])
+        }
+
+        # 不含空白的查询只可能落在某个词内部，先在词表中找出包含它的词，
+        # 以其倒排表作为候选区块；其余查询扫描全部区块。候选区块都再对当前数据做子串匹配
+        q = query.lower()
+        if blocks_only:
+            candidates = ()
+        elif q and not any(c.isspace() for c in q):
+            candidates = set()
+            for token, postings in self._inverted.items():
+                if q in token:
+                    candidates |= postings
+            candidates = sorted(candidates)
+        else:
+            candidates = range(len(self.chain))
+        tx_indices = [
+            i
+            for i in candidates
+            if isinstance(self.chain[i]["data"], dict)
+            and any(q in str(v).lower() for v in self.chain[i]["data"].values())
+        ]
+
+        for i in found:
+            self.record_access(i)
+
+        return {
+            "blocks": [
+                {"index": i, "hash": self.chain[i]["hash"]} for i in sorted(found)
+            ],
+            "transactions": [
+                {"block_index": i, "data": self.chain[i]["data"]} for i in tx_indices
+            ],
+        }
+
+    def is_valid(self):
+        # 检查假定有效高度之上各区块当前的previous_hash与前一区块当前的hash是否一致
+        chain = self.chain
+        start = max(1, self.assume_valid_height)
+        previous = [block["previous_hash"] for block in chain[start:]]
+        if previous != [block["hash"] for block in chain[start - 1 : -1]]:
+            return False
+        # 只有上面的检查通过后才推进假定有效高度
+        self.assume_valid_height = max(
+            self.assume_valid_height, len(self.chain) - ASSUME_VALID_DEPTH
+        )
+        return True
+
+
+def _gunicorn_serve(app, host, port, threads):
+    """以gunicorn运行：区块链保存在进程内存中，只开一个gthread worker"""
+    from gunicorn.app.base import BaseApplication
+
+    class _Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", 1)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("threads", threads)
+            self.cfg.set("keepalive", 5)
+
+        def load(self):
+            return app
+
+    _Application().run()
+
+
+def serve(app, host="0.0.0.0", port=9000, threads=16):
+    """启动服务：FLASK_ENV=development时使用带调试器的开发服务器；
+    否则依次尝试gunicorn、waitress，都未安装时退回Flask自带的多线程服务器
+    """
+    if os.getenv("FLASK_ENV") == "development":
+        app.run(host=host, port=port, debug=True)
+        return
+    try:
+        _gunicorn_serve(app, host, port, threads)
+        return
+    except ImportError:
+        pass
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        app.run(host=host, port=port, threaded=True)
+    else:
+        waitress_serve(app, host=host, port=port, threads=threads)
@@ -11,16 +11,29 @@ All-in-One API Server for Quantum Blockchain
 
 import json
 import time
-import hashlib
 import random
 from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
+from werkzeug.exceptions import BadRequest
+
+from qchain_core import (
+    OrjsonProvider,
+    QuantumBlockchain,
+    batch_items,
+    random_bits,
+    serve,
+    sha256_hex,
+)
 
 app = Flask(__name__, template_folder="../../templates", static_folder="../../static")
+app.json = OrjsonProvider(app)
 CORS(app)
 
 API_VERSION = "1.0"
 
+# PQEC模拟用的独立伪随机数生成器（非密码学用途），与全局random状态隔离
+_rng = random.Random()
+
 
 def success_response(data, message="success"):
     """统一成功响应"""
@@ -44,70 +57,6 @@ def error_response(code, message, data=None):
     }
 
 
-class QuantumBlockchain:
-    """量子区块链核心"""
-
-    def __init__(self):
-        self.chain = []
-        self.pending_transactions = []
-        self.create_genesis_block()
-
-    def _quantum_signature(self, bits=256):
-        """生成量子签名"""
-        return "".join(random.choice("0123456789abcdef") for _ in range(bits // 4))
-
-    def _quantum_hash(self, data):
-        """量子哈希"""
-        classic = hashlib.sha256(str(data).encode()).hexdigest()
-        quantum_part = self._quantum_signature(64)
-        return hashlib.sha256((classic + quantum_part).encode()).hexdigest()
-
-    def create_genesis_block(self):
-        """创建创世区块"""
-        genesis = {
-            "index": 0,
-            "timestamp": str(time.time()),
-            "data": {"message": "Genesis Block - Q-CHAIN", "token": "QTC"},
-            "previous_hash": "0" * 64,
-            "quantum_signature": self._quantum_signature(256),
-            "quantum_proof": "",
-            "hash": self._quantum_hash({"genesis": 0}),
-        }
-        self.chain.append(genesis)
-        return genesis
-
-    def add_block(self, data, quantum_proof=""):
-        """添加区块"""
-        prev = self.chain[-1]
-        new_block = {
-            "index": len(self.chain),
-            "timestamp": str(time.time()),
-            "data": data,
-            "previous_hash": prev["hash"],
-            "quantum_signature": self._quantum_signature(256),
-            "quantum_proof": quantum_proof,
-            "hash": self._quantum_hash(
-                {
-                    "index": len(self.chain),
-                    "data": data,
-                    "previous_hash": prev["hash"],
-                    "proof": quantum_proof,
-                }
-            ),
-        }
-        self.chain.append(new_block)
-        return new_block
-
-    def is_valid(self):
-        """验证区块链"""
-        for i in range(1, len(self.chain)):
-            curr = self.chain[i]
-            prev = self.chain[i - 1]
-            if curr["previous_hash"] != prev["hash"]:
-                return False
-        return True
-
-
 class PQECConsensus:
     """PQEC共识引擎"""
 
@@ -119,40 +68,50 @@ class PQECConsensus:
 
     def mine(self, data, difficulty=3):
         """PQEC挖矿"""
+        return self.mine_batch([data], difficulty)[0]
+
+    def mine_batch(self, items, difficulty=3):
+        """批量PQEC挖矿：先构造全部证明输入，再在一个循环中统一哈希"""
         start_time = time.time()
 
         code_types = ["Shor", "Surface", "BitFlip"]
-        code_type = random.choice(code_types)
-
-        proof = self._generate_pqec_proof(data, difficulty)
+        chosen = _rng.choices(code_types, k=len(items))
+
+        # 时间戳部分对整批相同，只格式化一次
+        suffix = f":{start_time}:"
+        rand = _rng.random
+        proofs = [
+            self._generate_pqec_proof(
+                sha256_hex(f"{data}{suffix}{rand()}".encode()), difficulty
+            )
+            for data in items
+        ]
 
         elapsed = time.time() - start_time
-        self.total_proofs += 1
-        self.successful_proofs += 1
+        self.total_proofs += len(items)
+        self.successful_proofs += len(items)
         self.total_time += elapsed
 
-        return {
-            "proof": proof,
-            "code_type": code_type,
-            "difficulty": difficulty,
-            "mining_time": elapsed,
-        }
-
-    def _generate_pqec_proof(self, data, difficulty):
-        """生成PQEC证明"""
-        base = f"{data}:{time.time()}:{random.random()}"
-        proof_data = hashlib.sha256(base.encode()).hexdigest()
-
-        error_correction = f"EC:{difficulty}:"
-        for _ in range(difficulty * 4):
-            error_correction += self._simulate_error_correction()
+        per_item = elapsed / len(items) if items else 0
+        return [
+            {
+                "proof": proof,
+                "code_type": code_type,
+                "difficulty": difficulty,
+                "mining_time": per_item,
+            }
+            for proof, code_type in zip(proofs, chosen)
+        ]
 
-        return f"{proof_data}:{error_correction}"
+    def _generate_pqec_proof(self, proof_data, difficulty):
+        """生成PQEC证明：一次抽取全部纠错操作及其结果比特"""
+        steps = difficulty * 4
+        operations = _rng.choices(
+            ["encode", "syndrome", "correct", "verify"], k=max(steps, 0)
+        )
+        error_correction = "".join(map(str.__add__, operations, random_bits(steps)))
 
-    def _simulate_error_correction(self):
-        """模拟纠错"""
-        operations = ["encode", "syndrome", "correct", "verify"]
-        return random.choice(operations) + random.choice(["0", "1"])
+        return f"{proof_data}:EC:{difficulty}:{error_correction}"
 
     def verify(self, proof, difficulty):
         """验证PQEC证明"""
@@ -179,7 +138,7 @@ class PQECConsensus:
         }
 
 
-blockchain = QuantumBlockchain()
+blockchain = QuantumBlockchain(genesis_message="Genesis Block - Q-CHAIN")
 pqec = PQECConsensus()
 
 
@@ -207,194 +166,279 @@ def unified_api():
         params = params_json
 
     try:
+        if action in CACHED_ACTIONS:
+            return cached_response(action, params)
         result = handle_action(action, params)
         return jsonify(result)
+    except BadRequest as e:
+        return jsonify(error_response(1, e.description)), 400
     except Exception as e:
         return jsonify(error_response(3, str(e)))
 
 
-def handle_action(action, params):
-    """处理所有Action"""
+# 只依赖链内容的查询：按链版本生成弱ETag，未变化时返回304，变化前复用已编码的响应
+CACHED_ACTIONS = ("get_blockchain", "get_blocks")
 
-    # ===== 区块链操作 =====
-    if action == "get_blockchain":
-        return success_response(
-            {
-                "chain": blockchain.chain,
-                "length": len(blockchain.chain),
-                "qec_enabled": True,
-            }
-        )
 
-    elif action == "get_blocks":
-        blocks = [
-            {
-                "index": b["index"],
-                "timestamp": b["timestamp"],
-                "hash": b["hash"][:16] + "...",
-                "data": b["data"],
-            }
-            for b in blockchain.chain
-        ]
-        return success_response({"blocks": blocks, "count": len(blocks)})
-
-    elif action == "get_block":
-        index = params.get("index", 0)
-        if 0 <= index < len(blockchain.chain):
-            return success_response(blockchain.chain[index])
-        return error_response(2, "Block not found")
-
-    elif action == "get_latest_block":
-        return success_response(blockchain.chain[-1])
-
-    elif action == "add_block":
-        data = params.get("data", {})
-        proof = params.get("proof", "")
-        block = blockchain.add_block(data, proof)
-        return success_response({"block": block}, "Block added")
-
-    elif action == "validate_chain":
-        is_valid = blockchain.is_valid()
-        return success_response({"valid": is_valid})
-
-    # ===== 交易操作 =====
-    elif action == "get_transactions":
-        transactions = []
-        for b in blockchain.chain:
-            if isinstance(b["data"], dict):
-                transactions.append(
-                    {
-                        "block_index": b["index"],
-                        "timestamp": b["timestamp"],
-                        "data": b["data"],
-                    }
-                )
-        return success_response(
-            {"transactions": transactions, "count": len(transactions)}
-        )
+def _encode_untimed(action, params):
+    """编码去掉timestamp字段的响应（JSON对象，以}结尾）"""
+    result = handle_action(action, params)
+    result.pop("timestamp", None)
+    return app.json.dumps_bytes(result)
 
-    # ===== PQEC操作 =====
-    elif action == "pqec_mine":
-        data = params.get("data", "transaction data")
-        difficulty = params.get("difficulty", 3)
-        result = pqec.mine(data, difficulty)
 
-        new_block = blockchain.add_block(
-            {"transaction": data, "proof": result["proof"]}, result["proof"]
-        )
+def cached_response(action, params):
+    etag = f'W/"{action}-{blockchain.version}"'
+    if request.headers.get("If-None-Match") == etag:
+        return "", 304, {"ETag": etag}
+    # 缓存的响应体不含timestamp，每次响应时在末尾补上当前时间，避免返回过期的时间戳
+    body = blockchain.encoded(action, lambda: _encode_untimed(action, params))
+    body = body[:-1] + b',"timestamp":%d}' % int(time.time())
+    response = app.response_class(body, mimetype="application/json")
+    response.headers["ETag"] = etag
+    return response
 
-        return success_response(
-            {
-                "block": new_block,
-                "proof": result["proof"],
-                "code_type": result["code_type"],
-                "mining_time": round(result["mining_time"], 4),
-                "difficulty": result["difficulty"],
-            }
-        )
 
-    elif action == "pqec_verify":
-        proof = params.get("proof", "")
-        difficulty = params.get("difficulty", 3)
-        is_valid = pqec.verify(proof, difficulty)
-        return success_response({"valid": is_valid})
+# ===== 区块链操作 =====
 
-    elif action == "pqec_status":
-        return success_response(
-            {
-                "difficulty": pqec.difficulty,
-                "total_blocks": len(blockchain.chain),
-                "qec_enabled": True,
-                "consensus": "PQEC",
-            }
-        )
 
-    elif action == "pqec_stats":
-        return success_response(pqec.get_stats())
+def _act_get_blockchain(params):
+    return success_response(
+        {
+            "chain": blockchain.chain,
+            "length": len(blockchain.chain),
+            "qec_enabled": True,
+        }
+    )
 
-    elif action == "pqec_codes":
-        return success_response(
-            {
-                "codes": [
-                    {"name": "Shor", "qubits": 9, "description": "Shor量子纠错码"},
-                    {"name": "Surface", "qubits": 17, "description": "表面码"},
-                    {"name": "BitFlip", "qubits": 3, "description": "位翻转码"},
-                    {"name": "PhaseFlip", "qubits": 3, "description": "相位翻转码"},
-                ]
-            }
-        )
 
-    elif action == "pqec_simulate_error":
-        code_type = params.get("code_type", "Shor")
-        error_prob = params.get("error_probability", 0.1)
+def _act_get_blocks(params):
+    blocks = [
+        {
+            "index": b["index"],
+            "timestamp": b["timestamp"],
+            "hash": b["hash"][:16] + "...",
+            "data": b["data"],
+        }
+        for b in blockchain.chain
+    ]
+    return success_response({"blocks": blocks, "count": len(blocks)})
 
-        qubits = {"Shor": 9, "Surface": 17, "BitFlip": 3, "PhaseFlip": 3}
-        num_qubits = qubits.get(code_type, 3)
 
-        original_state = "".join(random.choice("01") for _ in range(num_qubits))
+def _act_get_block(params):
+    index = params.get("index", 0)
+    if 0 <= index < len(blockchain.chain):
+        return success_response(blockchain.chain[index])
+    return error_response(2, "Block not found")
 
-        errors = int(num_qubits * error_prob)
-        error_positions = random.sample(range(num_qubits), min(errors, num_qubits))
 
-        error_state = list(original_state)
-        for pos in error_positions:
-            error_state[pos] = "1" if error_state[pos] == "0" else "0"
-        error_state = "".join(error_state)
+def _act_get_latest_block(params):
+    return success_response(blockchain.tip)
 
-        corrected_state = original_state
 
-        return success_response(
-            {
-                "code_type": code_type,
-                "num_qubits": num_qubits,
-                "original_state": original_state,
-                "error_applied": error_state,
-                "corrected_state": corrected_state,
-                "error_corrected": True,
-                "error_probability": error_prob,
-            }
-        )
+def _act_add_block(params):
+    data = params.get("data", {})
+    proof = params.get("proof", "")
+    block = blockchain.add_block(data, proof)
+    return success_response({"block": block}, "Block added")
 
-    # ===== 量子操作 =====
-    elif action == "quantum_generate_signature":
-        bits = params.get("bits", 256)
-        signature = blockchain._quantum_signature(bits)
-        return success_response({"signature": signature, "bits": bits})
-
-    elif action == "quantum_hash":
-        data = params.get("data", "")
-        size = params.get("size", 64)
-        hash_result = blockchain._quantum_hash(data)
-        return success_response({"hash": hash_result[: size // 4], "data": data})
-
-    elif action == "quantum_random":
-        bits = params.get("bits", 64)
-        random_bits = "".join(random.choice("01") for _ in range(bits))
-        return success_response(
-            {"bits": random_bits, "hex": hex(int(random_bits, 2))[2:]}
-        )
 
-    # ===== 搜索 =====
-    elif action == "search":
-        query = params.get("query", "")
-        results = {"blocks": [], "transactions": []}
-
-        for b in blockchain.chain:
-            if str(b["index"]) == query or query in str(b["hash"]):
-                results["blocks"].append({"index": b["index"], "hash": b["hash"]})
-            if isinstance(b["data"], dict):
-                for v in b["data"].values():
-                    if query.lower() in str(v).lower():
-                        results["transactions"].append(
-                            {"block_index": b["index"], "data": b["data"]}
-                        )
-                        break
-
-        return success_response(results)
-
-    # ===== 默认 =====
+def _act_validate_chain(params):
+    is_valid = blockchain.is_valid()
+    return success_response({"valid": is_valid})
+
+
+# ===== 交易操作 =====
+
+
+def _act_get_transactions(params):
+    transactions = []
+    for b in blockchain.chain:
+        if isinstance(b["data"], dict):
+            transactions.append(
+                {
+                    "block_index": b["index"],
+                    "timestamp": b["timestamp"],
+                    "data": b["data"],
+                }
+            )
+    return success_response({"transactions": transactions, "count": len(transactions)})
+
+
+# ===== PQEC操作 =====
+
+
+def _act_pqec_mine(params):
+    data = params.get("data", "transaction data")
+    difficulty = params.get("difficulty", 3)
+    result = pqec.mine(data, difficulty)
+
+    new_block = blockchain.add_block(
+        {"transaction": data, "proof": result["proof"]}, result["proof"]
+    )
+
+    return success_response(
+        {
+            "block": new_block,
+            "proof": result["proof"],
+            "code_type": result["code_type"],
+            "mining_time": round(result["mining_time"], 4),
+            "difficulty": result["difficulty"],
+        }
+    )
+
+
+def _act_pqec_mine_batch(params):
+    items = batch_items(params)
+    difficulty = params.get("difficulty", 3)
+    results = pqec.mine_batch(items, difficulty)
+
+    blocks = [
+        blockchain.add_block({"transaction": data, "proof": r["proof"]}, r["proof"])
+        for data, r in zip(items, results)
+    ]
+
+    return success_response(
+        {
+            "blocks": blocks,
+            "proofs": [r["proof"] for r in results],
+            "count": len(blocks),
+            "difficulty": difficulty,
+        }
+    )
+
+
+def _act_pqec_verify(params):
+    proof = params.get("proof", "")
+    difficulty = params.get("difficulty", 3)
+    is_valid = pqec.verify(proof, difficulty)
+    return success_response({"valid": is_valid})
+
+
+def _act_pqec_status(params):
+    return success_response(
+        {
+            "difficulty": pqec.difficulty,
+            "total_blocks": len(blockchain.chain),
+            "qec_enabled": True,
+            "consensus": "PQEC",
+        }
+    )
+
+
+def _act_pqec_stats(params):
+    return success_response(pqec.get_stats())
+
+
+# 支持的纠错码列表（固定内容）
+PQEC_CODES = {
+    "codes": [
+        {"name": "Shor", "qubits": 9, "description": "Shor量子纠错码"},
+        {"name": "Surface", "qubits": 17, "description": "表面码"},
+        {"name": "BitFlip", "qubits": 3, "description": "位翻转码"},
+        {"name": "PhaseFlip", "qubits": 3, "description": "相位翻转码"},
+    ]
+}
+
+
+def _act_pqec_codes(params):
+    return success_response(PQEC_CODES)
+
+
+def _act_pqec_simulate_error(params):
+    code_type = params.get("code_type", "Shor")
+    error_prob = params.get("error_probability", 0.1)
+
+    qubits = {"Shor": 9, "Surface": 17, "BitFlip": 3, "PhaseFlip": 3}
+    num_qubits = qubits.get(code_type, 3)
+
+    # 状态以整数表示，出错比特组成掩码后一次异或
+    original = _rng.getrandbits(num_qubits)
+    errors = int(num_qubits * error_prob)
+    if errors <= 0:
+        error_mask = 0
+    elif errors >= num_qubits:
+        error_mask = (1 << num_qubits) - 1
     else:
+        error_mask = sum(1 << p for p in _rng.sample(range(num_qubits), errors))
+
+    state_format = f"0{num_qubits}b"
+    original_state = format(original, state_format)
+    error_state = format(original ^ error_mask, state_format)
+    corrected_state = original_state
+
+    return success_response(
+        {
+            "code_type": code_type,
+            "num_qubits": num_qubits,
+            "original_state": original_state,
+            "error_applied": error_state,
+            "corrected_state": corrected_state,
+            "error_corrected": True,
+            "error_probability": error_prob,
+        }
+    )
+
+
+# ===== 量子操作 =====
+
+
+def _act_quantum_generate_signature(params):
+    bits = params.get("bits", 256)
+    signature = blockchain._quantum_signature(bits)
+    return success_response({"signature": signature, "bits": bits})
+
+
+def _act_quantum_hash(params):
+    data = params.get("data", "")
+    size = params.get("size", 64)
+    hash_result = blockchain._quantum_hash(data)
+    return success_response({"hash": hash_result[: size // 4], "data": data})
+
+
+def _act_quantum_random(params):
+    bits = params.get("bits", 64)
+    bit_string = random_bits(bits)
+    return success_response({"bits": bit_string, "hex": hex(int(bit_string, 2))[2:]})
+
+
+# ===== 搜索 =====
+
+
+def _act_search(params):
+    query = params.get("query", "")
+    return success_response(blockchain.search(query))
+
+
+# action名 -> 处理函数，按字典一次查找分派
+ACTION_DISPATCH = {
+    "get_blockchain": _act_get_blockchain,
+    "get_blocks": _act_get_blocks,
+    "get_block": _act_get_block,
+    "get_latest_block": _act_get_latest_block,
+    "add_block": _act_add_block,
+    "validate_chain": _act_validate_chain,
+    "get_transactions": _act_get_transactions,
+    "pqec_mine": _act_pqec_mine,
+    "pqec_mine_batch": _act_pqec_mine_batch,
+    "pqec_verify": _act_pqec_verify,
+    "pqec_status": _act_pqec_status,
+    "pqec_stats": _act_pqec_stats,
+    "pqec_codes": _act_pqec_codes,
+    "pqec_simulate_error": _act_pqec_simulate_error,
+    "quantum_generate_signature": _act_quantum_generate_signature,
+    "quantum_hash": _act_quantum_hash,
+    "quantum_random": _act_quantum_random,
+    "search": _act_search,
+}
+
+
+def handle_action(action, params):
+    """处理所有Action"""
+    handler = ACTION_DISPATCH.get(action)
+    if handler is None:
         return error_response(1, f"Unknown action: {action}")
+    return handler(params)
 
 
 # ==================== 页面路由 ====================
@@ -433,10 +477,12 @@ if __name__ == "__main__":
     print("=" * 60)
     print("\n可用Action:")
     print("  区块链: get_blockchain, get_blocks, add_block, validate_chain")
-    print("  PQEC:   pqec_mine, pqec_verify, pqec_stats, pqec_simulate_error")
+    print(
+        "  PQEC:   pqec_mine, pqec_mine_batch, pqec_verify, pqec_stats, pqec_simulate_error"
+    )
     print("  量子:   quantum_generate_signature, quantum_hash, quantum_random")
     print("  搜索:   search")
     print("\n启动服务: http://127.0.0.1:9000")
     print("=" * 60)
 
-    app.run(host="0.0.0.0", port=9000, debug=True)
+    serve(app)
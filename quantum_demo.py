@@ -9,6 +9,7 @@
 import time
 import json
 import numpy as np
+import orjson
 import matplotlib.pyplot as plt
 from qiskit import QuantumCircuit, transpile
 from qiskit_aer import Aer
@@ -18,6 +19,10 @@ from qiskit.quantum_info import Statevector
 # 导入我们的量子区块链实现
 from quantum_blockchain import QuantumBlockchain, QuantumRandom, QuantumHash, Block
 
+# 模拟器后端只获取一次，各函数共享
+_SIMULATOR = Aer.get_backend('qasm_simulator')
+_STATEVECTOR_SIMULATOR = Aer.get_backend('statevector_simulator')
+
 # 量子增强的密钥生成 - 完全利用量子态叠加和纠缠
 def quantum_key_generation(num_qubits=4):
     """
@@ -57,14 +62,14 @@ def quantum_key_generation(num_qubits=4):
     qc.measure(range(num_qubits), range(num_qubits))
     
     # 在模拟器上执行电路
-    simulator = Aer.get_backend('qasm_simulator')
+    simulator = _SIMULATOR
     qc_compiled = transpile(qc, simulator)
     job = simulator.run(qc_compiled, shots=1024)
     result = job.result()
     counts = result.get_counts(qc)
     
     # 可视化量子态（在测量前）
-    statevector_sim = Aer.get_backend('statevector_simulator')
+    statevector_sim = _STATEVECTOR_SIMULATOR
     qc_no_measure = QuantumCircuit(num_qubits)
     
     # 复制上面的操作但不进行测量
@@ -94,6 +99,33 @@ def quantum_key_generation(num_qubits=4):
     
     return statevector, most_frequent
 
+def _fold_rotations(angles):
+    """
+    将一串 RZ(a)、RX(a/2) 旋转合并为一个 2x2 酉矩阵
+    
+    Args:
+        angles: 按施加顺序排列的旋转角
+        
+    Returns:
+        等价的单量子比特酉矩阵
+    """
+    half = angles / 2
+    quarter = angles / 4
+    # RX(a/2)·RZ(a)，逐个字节向量化构造
+    rz = np.zeros((len(angles), 2, 2), dtype=complex)
+    rz[:, 0, 0] = np.exp(-1j * half)
+    rz[:, 1, 1] = np.exp(1j * half)
+    rx = np.empty((len(angles), 2, 2), dtype=complex)
+    rx[:, 0, 0] = rx[:, 1, 1] = np.cos(quarter)
+    rx[:, 0, 1] = rx[:, 1, 0] = -1j * np.sin(quarter)
+    mats = rx @ rz
+    # 成对相乘（后施加的在左），对数层数内归约为一个矩阵
+    while len(mats) > 1:
+        if len(mats) % 2:
+            mats = np.concatenate([mats, np.eye(2, dtype=complex)[None]])
+        mats = mats[1::2] @ mats[0::2]
+    return mats[0]
+
 # 量子签名生成 - 利用量子抗碰撞性
 def quantum_signature(message, key, num_qubits=8):
     """
@@ -118,19 +150,16 @@ def quantum_signature(message, key, num_qubits=8):
     for i in range(num_qubits):
         qc.h(i)
     
-    # 基于消息修改量子态
-    for idx, byte in enumerate(message_bytes):
-        qubit_idx = idx % num_qubits
-        # 基于字节值设置旋转角度
-        angle = (byte / 255.0) * np.pi
-        qc.rz(angle, qubit_idx)  # 绕Z轴旋转
-        qc.rx(angle/2, qubit_idx)  # 绕X轴旋转
+    # 基于消息修改量子态：每个字节依次绕Z轴、X轴旋转，同一量子位上的旋转合并为一个门
+    angles = np.frombuffer(message_bytes, dtype=np.uint8) / 255.0 * np.pi
+    for qubit_idx in range(min(num_qubits, len(angles))):
+        qc.unitary(_fold_rotations(angles[qubit_idx::num_qubits]), [qubit_idx])
     
-    # 使用密钥比特进一步修改量子态
-    for i, bit in enumerate(key):
-        if bit == '1':
-            qc.z(i % num_qubits)  # 应用Z门
-            qc.t(i % num_qubits)  # 应用T门增加相位
+    # 使用密钥比特进一步修改量子态：Z门和T门都是对角门，按量子位计数后合并为一个相位门
+    key_bits = np.frombuffer(key.encode(), dtype=np.uint8) == ord('1')
+    key_counts = np.bincount(np.flatnonzero(key_bits) % num_qubits, minlength=num_qubits)
+    for i in np.flatnonzero(key_counts):
+        qc.p((key_counts[i] * 5 * np.pi / 4) % (2 * np.pi), int(i))  # Z·T = P(5π/4)
     
     # 创建复杂的纠缠结构
     for i in range(num_qubits-1):
@@ -155,7 +184,7 @@ def quantum_signature(message, key, num_qubits=8):
     qc.measure(range(num_qubits), range(num_qubits))
     
     # 模拟量子电路
-    simulator = Aer.get_backend('qasm_simulator')
+    simulator = _SIMULATOR
     qc_compiled = transpile(qc, simulator)
     job = simulator.run(qc_compiled, shots=1024)
     result = job.result()
@@ -222,7 +251,7 @@ def quantum_fractal_merkle_tree(transactions):
         qc.measure(range(num_qubits), range(num_qubits))
         
         # 执行电路
-        simulator = Aer.get_backend('qasm_simulator')
+        simulator = _SIMULATOR
         qc_compiled = transpile(qc, simulator)
         job = simulator.run(qc_compiled, shots=8)  # 获取多个结果
         result = job.result()
@@ -277,7 +306,7 @@ def quantum_fractal_merkle_tree(transactions):
     hashed_transactions = []
     for tx in transactions:
         # 序列化交易
-        tx_data = json.dumps(tx, sort_keys=True)
+        tx_data = orjson.dumps(tx, option=orjson.OPT_SORT_KEYS).decode()
         # 添加量子随机性
         quantum_bits = QuantumRandom.generate_random_bits(32)
         # 组合并哈希
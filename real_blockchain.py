@@ -7,6 +7,7 @@
 """
 
 import hashlib
+import hmac
 import json
 import time
 import datetime as dt
@@ -17,7 +18,40 @@ from typing import Dict, List, Any, Optional, Tuple, Set
 import socket
 import threading
 import argparse
+from multiprocessing import Pool
 from collections import defaultdict
+from contextlib import contextmanager
+from functools import partial
+
+import orjson
+
+# 可选的Numba挖矿内核（需要numpy与numba），不可用时使用纯Python搜索
+try:
+    from mining_kernel import NUMBA_AVAILABLE, search_nonce
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# SHA-256后端在导入时按CPU特性选择一次（见 sha_dispatch.py）
+from sha_dispatch import single_hash as _sha256, batch_hash as _batch_hash
+
+# 仅在本地使用、不参与共识也不需跨节点一致的内部哈希（如secure_hash）：优先BLAKE3，未安装时退回BLAKE2b-256
+try:
+    from blake3 import blake3 as _internal_hash
+except ImportError:
+    _internal_hash = partial(hashlib.blake2b, digest_size=32)
+
+# 区块哈希使用的规范化JSON编码器（共识格式，与json.dumps(sort_keys=True)逐字节一致），只构造一次
+_canonical_json = json.JSONEncoder(sort_keys=True).encode
+
+# 保存区块链文件时的orjson选项（区块数据可能含非字符串键）
+_SAVE_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+# 交易签名载荷的序列化选项：只在本节点内签名与验证，不参与区块哈希，可以使用orjson
+_SIGNING_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+def _signing_json(obj: Any) -> str:
+    """按键排序序列化待签名的数据（orjson）"""
+    return orjson.dumps(obj, option=_SIGNING_OPTIONS).decode()
 
 class CryptoUtils:
     """加密实用工具类"""
@@ -27,21 +61,45 @@ class CryptoUtils:
         """
         生成随机比特串
         
+        已弃用：仅为兼容保留，新代码请使用 random_bytes / random_hex
+        
         Args:
             num_bits: 要生成的随机比特数量
             
         Returns:
             一个随机的二进制字符串
         """
-        # 使用操作系统的加密安全随机数生成器
-        random_bytes = os.urandom(num_bits // 8)
+        # 兼容接口：一次性把随机字节按整数格式化为定长二进制串
+        width = num_bits // 8 * 8
+        if not width:
+            return ""
+        return format(int.from_bytes(os.urandom(width // 8), 'big'), f'0{width}b')
+    
+    @staticmethod
+    def random_bytes(num_bits: int = 256) -> bytes:
+        """
+        生成随机字节（操作系统的加密安全随机数生成器）
         
-        # 转换为二进制字符串
-        result_bits = ""
-        for byte in random_bytes:
-            result_bits += format(byte, '08b')
+        Args:
+            num_bits: 要生成的随机比特数量
             
-        return result_bits
+        Returns:
+            num_bits // 8 个随机字节
+        """
+        return os.urandom(num_bits // 8)
+    
+    @staticmethod
+    def random_hex(num_bits: int = 256) -> str:
+        """
+        生成随机十六进制串，不经过二进制字符串中转
+        
+        Args:
+            num_bits: 要生成的随机比特数量
+            
+        Returns:
+            十六进制字符串
+        """
+        return os.urandom(num_bits // 8).hex()
     
     @staticmethod
     def bitstring_to_hex(bitstring: str) -> str:
@@ -74,15 +132,15 @@ class CryptoUtils:
         Returns:
             哈希字符串（十六进制）
         """
-        # 首先使用SHA-256
-        sha256_hash = hashlib.sha256(data.encode()).hexdigest()
+        # 首先使用内部哈希（BLAKE3或BLAKE2b-256）
+        first_hash = _internal_hash(data.encode()).hexdigest()
         
         # 使用哈希结果生成额外的随机性
         salt = os.urandom(16)  # 使用真正的随机盐
-        salted_data = sha256_hash.encode() + salt
+        salted_data = first_hash.encode() + salt
         
-        # 再次应用SHA-256
-        final_hash = hashlib.sha256(salted_data).hexdigest()
+        # 再次应用内部哈希
+        final_hash = _internal_hash(salted_data).hexdigest()
         
         # 截断到所需大小
         return final_hash[:output_size]
@@ -101,15 +159,18 @@ class KeyPair:
             self.private_key = private_key
         else:
             # 生成新的私钥
-            random_bits = CryptoUtils.generate_random_bits(256)
-            self.private_key = CryptoUtils.bitstring_to_hex(random_bits)
+            self.private_key = os.urandom(32).hex()
             
         # 从私钥生成"公钥"（实际实现应使用椭圆曲线密码学）
+        # 公钥即链上地址（创世区块的creator_address、代币余额的键），必须保持SHA-256派生
         self.public_key = hashlib.sha256(self.private_key.encode()).hexdigest()
+        
+        # 以私钥为密钥的HMAC-SHA256状态只构造一次，签名时复制后写入数据
+        self._signing_state = hmac.new(self.private_key.encode(), digestmod=_sha256)
     
     def sign(self, data: str) -> str:
         """
-        对数据进行签名
+        对数据进行签名（HMAC-SHA256，密钥为私钥）
         
         Args:
             data: 要签名的数据
@@ -117,8 +178,9 @@ class KeyPair:
         Returns:
             签名（十六进制字符串）
         """
-        message = data + self.private_key
-        return hashlib.sha256(message.encode()).hexdigest()
+        h = self._signing_state.copy()
+        h.update(data.encode())
+        return h.hexdigest()
     
     def verify(self, data: str, signature: str) -> bool:
         """
@@ -133,6 +195,26 @@ class KeyPair:
         """
         return self.sign(data) == signature
 
+def _pow_target(difficulty: int) -> int:
+    """工作量证明目标：摘要按大端整数小于该值即有difficulty个十六进制前导零"""
+    return 1 << max(256 - 4 * difficulty, 0)
+
+def _search_nonce_range(args: Tuple[bytes, bytes, int, int, int]) -> Optional[int]:
+    """
+    在一个nonce区间内搜索（挖矿进程池工作函数）
+    
+    hashlib对象无法跨进程传递，因此传入前缀字节并在工作进程内重建中间状态
+    
+    Args:
+        args: (前缀, 后缀, 工作量证明目标, 起始nonce, 尝试次数)
+        
+    Returns:
+        区间内最小的满足难度的nonce，未找到时返回None
+    """
+    prefix, suffix, target, start, count = args
+    found = Block._search_nonce(_sha256(prefix), suffix, target, start, count)
+    return found[0] if found else None
+
 class Token:
     """代币类，用于管理代币相关操作"""
     
@@ -150,8 +232,29 @@ class Token:
         self.symbol = symbol
         self.decimals = decimals
         self.total_supply = total_supply
-        self.balances = defaultdict(int)  # 地址 -> 余额的映射
-        self.allowed = defaultdict(lambda: defaultdict(int))  # 地址 -> (地址 -> 授权金额)的映射
+        # 只保存实际持有余额/授权的地址，查询未知地址不会插入零值条目
+        self.balances: Dict[str, int] = {}  # 地址 -> 余额的映射
+        self.allowed: Dict[Tuple[str, str], int] = {}  # (所有者, 被授权地址) -> 授权金额的映射
+        self._locks = defaultdict(threading.Lock)  # 地址 -> 账户锁，余额检查与更新在锁内完成
+    
+    @contextmanager
+    def _account_lock(self, *addresses: str):
+        """
+        获取相关账户的锁
+        
+        多把锁总按地址排序后的顺序获取，避免两笔方向相反的转账互相等待
+        
+        Args:
+            addresses: 本次操作涉及的地址
+        """
+        locks = [self._locks[address] for address in sorted(set(addresses))]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
     
     def initial_distribution(self, creator_address: str):
         """
@@ -172,7 +275,7 @@ class Token:
         Returns:
             余额
         """
-        return self.balances[owner]
+        return self.balances.get(owner, 0)
     
     def transfer(self, sender: str, recipient: str, amount: int) -> bool:
         """
@@ -186,11 +289,14 @@ class Token:
         Returns:
             是否成功
         """
-        if self.balances[sender] < amount:
-            return False
-        
-        self.balances[sender] -= amount
-        self.balances[recipient] += amount
+        balances = self.balances
+        with self._account_lock(sender, recipient):
+            sender_balance = balances.get(sender, 0)
+            if sender_balance < amount:
+                return False
+            
+            balances[sender] = sender_balance - amount
+            balances[recipient] = balances.get(recipient, 0) + amount
         return True
     
     def approve(self, owner: str, spender: str, amount: int) -> bool:
@@ -205,7 +311,8 @@ class Token:
         Returns:
             是否成功
         """
-        self.allowed[owner][spender] = amount
+        with self._account_lock(owner):
+            self.allowed[(owner, spender)] = amount
         return True
     
     def allowance(self, owner: str, spender: str) -> int:
@@ -219,7 +326,7 @@ class Token:
         Returns:
             授权额度
         """
-        return self.allowed[owner][spender]
+        return self.allowed.get((owner, spender), 0)
     
     def transfer_from(self, spender: str, owner: str, recipient: str, amount: int) -> bool:
         """
@@ -234,12 +341,17 @@ class Token:
         Returns:
             是否成功
         """
-        if self.balances[owner] < amount or self.allowed[owner][spender] < amount:
-            return False
-        
-        self.balances[owner] -= amount
-        self.balances[recipient] += amount
-        self.allowed[owner][spender] -= amount
+        balances = self.balances
+        key = (owner, spender)
+        with self._account_lock(owner, recipient):
+            owner_balance = balances.get(owner, 0)
+            allowance = self.allowed.get(key, 0)
+            if owner_balance < amount or allowance < amount:
+                return False
+            
+            balances[owner] = owner_balance - amount
+            balances[recipient] = balances.get(recipient, 0) + amount
+            self.allowed[key] = allowance - amount
         return True
     
     def to_dict(self) -> Dict:
@@ -249,13 +361,18 @@ class Token:
         Returns:
             代币信息字典
         """
+        # 扁平的授权表按所有者还原为嵌套结构，保持序列化格式不变
+        allowed: Dict[str, Dict[str, int]] = {}
+        for (owner, spender), amount in self.allowed.items():
+            allowed.setdefault(owner, {})[spender] = amount
+        
         return {
             "name": self.name,
             "symbol": self.symbol,
             "decimals": self.decimals,
             "total_supply": self.total_supply,
             "balances": dict(self.balances),
-            "allowed": {k: dict(v) for k, v in self.allowed.items()}
+            "allowed": allowed
         }
     
     @classmethod
@@ -275,16 +392,25 @@ class Token:
             decimals=data["decimals"],
             total_supply=data["total_supply"]
         )
-        token.balances = defaultdict(int, data["balances"])
-        token.allowed = defaultdict(lambda: defaultdict(int))
-        for owner, spenders in data["allowed"].items():
-            for spender, amount in spenders.items():
-                token.allowed[owner][spender] = amount
+        token.balances = dict(data["balances"])
+        token.allowed = {
+            (owner, spender): amount
+            for owner, spenders in data["allowed"].items()
+            for spender, amount in spenders.items()
+        }
         return token
 
 class Block:
     """区块链中的区块类"""
     
+    __slots__ = ("index", "timestamp", "data", "previous_hash", "difficulty",
+                 "nonce", "signature", "hash", "_encoded")
+    
+    # 挖矿时每批尝试的nonce数量
+    NONCE_BATCH = 1 << 20
+    # 未安装numba时，难度达到该值才使用多进程并行挖矿（低难度下进程启动开销大于收益）
+    PARALLEL_MIN_DIFFICULTY = 6
+    
     def __init__(
         self, 
         index: int, 
@@ -293,7 +419,8 @@ class Block:
         previous_hash: str, 
         signature: Optional[str] = None,
         difficulty: int = 4,
-        nonce: int = 0
+        nonce: int = 0,
+        hash: Optional[str] = None
     ):
         """
         初始化新的区块
@@ -303,9 +430,10 @@ class Block:
             timestamp: 时间戳
             data: 区块中存储的数据
             previous_hash: 前一个区块的哈希
-            signature: 可选，区块的签名
+            signature: 可选，区块的签名（默认为空字符串）
             difficulty: 挖矿难度（哈希前导零的个数）
             nonce: 工作量证明的随机数
+            hash: 可选，已知的区块哈希（从文件或其他节点加载时传入，跳过序列化与哈希）
         """
         self.index = index
         self.timestamp = timestamp
@@ -313,36 +441,181 @@ class Block:
         self.previous_hash = previous_hash
         self.difficulty = difficulty
         self.nonce = nonce
-        self.signature = signature or CryptoUtils.generate_random_bits(128)
-        self.hash = self._calculate_hash()
+        # 未签名区块使用确定的空签名，不再为每个区块生成随机数
+        self.signature = signature if signature is not None else ""
+        if hash is not None:
+            self._encoded = None
+            self.hash = hash
+        else:
+            # 序列化结果暂存给紧随其后的mine_block复用，挖矿后即释放；验证时总是重新序列化
+            self._encoded = self._prefix_bytes()
+            prefix, suffix = self._encoded
+            self.hash = self._hash_with_nonce(self.nonce, _sha256(prefix), suffix).hexdigest()
         
     def _calculate_hash(self) -> str:
         """计算区块的哈希值"""
-        block_string = json.dumps({
-            "index": self.index,
-            "timestamp": self.timestamp,
+        return self.recompute_hash()
+    
+    def recompute_digest(self) -> bytes:
+        """
+        按当前字段重新计算区块哈希的原始摘要
+        
+        验证时使用：区块字段可能被改动，因此总是重新序列化；单个哈希对象依次写入，不复制中间状态
+        
+        Returns:
+            32字节SHA-256摘要
+        """
+        prefix, suffix = self._prefix_bytes()
+        h = _sha256(prefix)
+        h.update(b'%d' % self.nonce)
+        h.update(suffix)
+        return h.digest()
+    
+    def _canonical_bytes(self) -> bytes:
+        """区块哈希的完整输入（规范化JSON字节）"""
+        prefix, suffix = self._prefix_bytes()
+        return prefix + b'%d' % self.nonce + suffix
+    
+    def recompute_hash(self) -> str:
+        """按当前字段重新计算区块哈希（十六进制）"""
+        return self.recompute_digest().hex()
+    
+    def _prefix_bytes(self) -> Tuple[bytes, bytes]:
+        """
+        按排序键序列化除nonce以外的字段
+        
+        排序后nonce位于index与previous_hash之间，拼接 前缀 + nonce + 后缀
+        与 json.dumps(..., sort_keys=True) 的结果逐字节一致
+        
+        Returns:
+            (前缀, 后缀) 字节串
+        """
+        head = _canonical_json({
             "data": self.data,
+            "index": self.index
+        })
+        tail = _canonical_json({
             "previous_hash": self.previous_hash,
             "signature": self.signature,
-            "nonce": self.nonce
-        }, sort_keys=True)
+            "timestamp": self.timestamp
+        })
+        return (head[:-1] + ', "nonce": ').encode(), (', ' + tail[1:]).encode()
+    
+    def _hash_with_nonce(self, nonce: int, base=None, suffix: bytes = None):
+        """
+        计算指定nonce下的区块哈希
+        
+        Args:
+            nonce: 工作量证明的随机数
+            base: 可选，已吸收前缀的SHA-256状态（挖矿时复用）
+            suffix: 可选，与base配套的后缀
+        
+        Returns:
+            已写入全部输入的SHA-256对象
+        """
+        if base is None:
+            prefix, suffix = self._prefix_bytes()
+            h = _sha256(prefix)
+        else:
+            h = base.copy()
+        h.update(b'%d' % nonce)
+        h.update(suffix)
+        return h
+    
+    @staticmethod
+    def _search_nonce(base, suffix: bytes, target: int, start: int, count: int):
+        """
+        在 [start, start + count) 范围内搜索满足难度的nonce
+        
+        循环内只保留复制状态、写入与比较，方法与属性查找都提前绑定为局部变量
+        
+        Args:
+            base: 已吸收前缀的SHA-256状态
+            suffix: nonce之后的后缀
+            target: 工作量证明目标，摘要整数小于该值即满足难度
+            start: 起始nonce
+            count: 本批尝试次数
         
-        # 使用安全哈希函数
-        return hashlib.sha256(block_string.encode()).hexdigest()
+        Returns:
+            (nonce, 哈希对象)，本批未找到时返回None
+        """
+        copy = base.copy
+        from_bytes = int.from_bytes
+        for nonce in range(start, start + count):
+            h = copy()
+            h.update(b'%d' % nonce)
+            h.update(suffix)
+            if from_bytes(h.digest(), 'big') < target:
+                return nonce, h
+        return None
+    
+    @classmethod
+    def _parallel_search(cls, prefix: bytes, suffix: bytes, target: int,
+                         start: int, workers: int) -> int:
+        """
+        多进程并行搜索nonce
+        
+        每轮把连续的nonce区间平均分给各进程，取本轮最小的命中，结果与串行搜索相同
+        
+        Args:
+            prefix: nonce之前的字节
+            suffix: nonce之后的字节
+            target: 工作量证明目标
+            start: 起始nonce
+            workers: 进程数
+            
+        Returns:
+            满足难度的nonce
+        """
+        batch = cls.NONCE_BATCH
+        with Pool(workers) as pool:
+            while True:
+                ranges = [(prefix, suffix, target, start + i * batch, batch)
+                          for i in range(workers)]
+                hits = [n for n in pool.map(_search_nonce_range, ranges) if n is not None]
+                if hits:
+                    return min(hits)
+                start += batch * workers
     
     def mine_block(self, difficulty: int) -> None:
         """
         挖掘区块（工作量证明）
         
+        前缀只序列化、哈希一次，每次尝试复制SHA-256中间状态后追加nonce与后缀，
+        前导零直接在原始摘要上按整数判断
+        
         Args:
             difficulty: 挖矿难度（哈希前导零的个数）
         """
-        target = '0' * difficulty
+        if self._encoded is not None:
+            prefix, suffix = self._encoded
+            self._encoded = None
+        else:
+            prefix, suffix = self._prefix_bytes()
+        base = _sha256(prefix)
+        target = _pow_target(difficulty)
+        
+        # 按批搜索nonce，每批在一次调用内完成；安装了numba时使用编译后的并行内核，
+        # 否则在多核机器上对高难度使用多进程
+        start = self.nonce
+        found = None
+        workers = os.cpu_count() or 1
+        if (not NUMBA_AVAILABLE and workers > 1
+                and difficulty >= self.PARALLEL_MIN_DIFFICULTY):
+            nonce = self._parallel_search(prefix, suffix, target, start, workers)
+            found = nonce, self._hash_with_nonce(nonce, base, suffix)
+        while found is None:
+            if NUMBA_AVAILABLE:
+                nonce = search_nonce(prefix, suffix, difficulty, start, self.NONCE_BATCH)
+                if nonce >= 0:
+                    found = nonce, self._hash_with_nonce(nonce, base, suffix)
+            else:
+                found = self._search_nonce(base, suffix, target, start, self.NONCE_BATCH)
+            start += self.NONCE_BATCH
+        
+        self.nonce, h = found
+        self.hash = h.hexdigest()
         
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self._calculate_hash()
-            
         print(f"区块已挖出！哈希: {self.hash}, Nonce: {self.nonce}")
     
     def to_dict(self) -> Dict:
@@ -370,21 +643,42 @@ class Blockchain:
             token_symbol: 代币符号
             token_supply: 代币总供应量
         """
-        self.chain: List[Block] = []
-        self.difficulty = difficulty
-        self.pending_transactions = []
-        self.nodes = set()  # 存储网络中的其他节点
+        self._init_state(difficulty)
         
         # 创建代币
         self.token = Token(name=token_name, symbol=token_symbol, total_supply=token_supply)
         
         self._create_genesis_block()
+    
+    def _init_state(self, difficulty: int) -> None:
+        """初始化链的基础状态（不含代币与创世区块）"""
+        self.chain: List[Block] = []
+        self._by_hash: Dict[str, int] = {}  # 区块哈希 -> 链上位置
+        self.difficulty = difficulty
+        self.pending_transactions = []
+        self.nodes = set()  # 存储网络中的其他节点
+    
+    @classmethod
+    def _empty(cls, difficulty: int) -> 'Blockchain':
+        """
+        创建空的区块链对象，不生成也不挖掘创世区块（加载已有链时使用）
         
+        Args:
+            difficulty: 挖矿难度
+            
+        Returns:
+            没有区块和代币的区块链对象，由调用方填充
+        """
+        blockchain = cls.__new__(cls)
+        blockchain._init_state(difficulty)
+        blockchain.token = None
+        return blockchain
+    
     def _create_genesis_block(self) -> None:
         """创建并添加创世区块，同时初始分配代币"""
         # 创世区块的特殊签名
-        genesis_signature = CryptoUtils.generate_random_bits(256)
-        sig_hex = CryptoUtils.bitstring_to_hex(genesis_signature)
+        genesis_signature = CryptoUtils.random_hex(256)
+        sig_hex = genesis_signature
         
         # 创建密钥对（作为创始人地址）
         creator_key_pair = KeyPair()
@@ -418,9 +712,41 @@ class Blockchain:
         genesis_block.mine_block(self.difficulty)
         
         self.chain.append(genesis_block)
+        self._by_hash[genesis_block.hash] = genesis_block.index
         print(f"创世区块已创建! 哈希: {genesis_block.hash}")
         print(f"创世区块中初始分配的 {self.token.total_supply} {self.token.symbol} 代币给地址: {creator_address[:16]}...")
+        self._cache_genesis_info()
+    
+    def _cache_genesis_info(self) -> None:
+        """缓存每笔交易都会读取的只读信息（创建者地址、代币符号、代币信息），链或代币被替换后需重新调用"""
+        self._creator_address = self.chain[0].data.get("creator_address") if self.chain else None
+        self._symbol = self.token.symbol
+        # 代币信息中除总供应量（铸造时变化）外均为只读
+        self._token_info = {
+            "name": self.token.name,
+            "symbol": self._symbol,
+            "total_supply": None,
+            "decimals": self.token.decimals,
+            "creator": self._creator_address or "未知"
+        }
+        
+    def _rebuild_hash_index(self) -> None:
+        """整条链被替换或重新加载后重建哈希索引"""
+        self._by_hash = {block.hash: i for i, block in enumerate(self.chain)}
+    
+    def get_block_by_hash(self, block_hash: str) -> Optional[Block]:
+        """
+        按哈希查找区块（O(1)）
         
+        Args:
+            block_hash: 区块哈希
+            
+        Returns:
+            区块，不存在时返回None
+        """
+        i = self._by_hash.get(block_hash)
+        return self.chain[i] if i is not None else None
+    
     @property
     def last_block(self) -> Block:
         """获取最后一个区块"""
@@ -440,7 +766,7 @@ class Blockchain:
         # 如果提供了密钥对，对数据进行签名
         signature = None
         if key_pair:
-            data_str = json.dumps(data, sort_keys=True)
+            data_str = _signing_json(data)
             signature = key_pair.sign(data_str)
             # 在数据中添加公钥和签名信息
             if isinstance(data, dict):
@@ -459,6 +785,7 @@ class Blockchain:
         new_block.mine_block(self.difficulty)
         
         self.chain.append(new_block)
+        self._by_hash[new_block.hash] = new_block.index
         return new_block
     
     def transfer_token(self, sender_key: KeyPair, recipient_address: str, amount: int) -> Dict:
@@ -476,10 +803,11 @@ class Blockchain:
         sender_address = sender_key.public_key
         
         # 检查余额
-        if self.token.balances[sender_address] < amount:
+        balance = self.token.balance_of(sender_address)
+        if balance < amount:
             return {
                 "success": False,
-                "message": f"余额不足。当前余额: {self.token.balances[sender_address]}, 请求转账: {amount}"
+                "message": f"余额不足。当前余额: {balance}, 请求转账: {amount}"
             }
         
         # 执行转账
@@ -497,12 +825,12 @@ class Blockchain:
             "sender": sender_address,
             "recipient": recipient_address,
             "amount": amount,
-            "token": self.token.symbol,
+            "token": self._symbol,
             "timestamp": time.time()
         }
         
         # 对交易进行签名
-        transaction_string = json.dumps(transaction, sort_keys=True)
+        transaction_string = _signing_json(transaction)
         signature = sender_key.sign(transaction_string)
         transaction["signature"] = signature
         
@@ -511,7 +839,7 @@ class Blockchain:
         
         return {
             "success": True,
-            "message": f"成功转移 {amount} {self.token.symbol} 从 {sender_address[:10]}... 到 {recipient_address[:10]}...",
+            "message": f"成功转移 {amount} {self._symbol} 从 {sender_address[:10]}... 到 {recipient_address[:10]}...",
             "transaction": transaction
         }
     
@@ -540,11 +868,10 @@ class Blockchain:
             铸造结果
         """
         # 检查创世区块中的创建者地址
-        creator_address = self.chain[0].data.get("creator_address")
         admin_address = admin_key.public_key
         
         # 只有创建者才能铸造新代币
-        if creator_address != admin_address:
+        if self._creator_address != admin_address:
             return {
                 "success": False,
                 "message": "只有区块链创建者才能铸造新代币"
@@ -554,7 +881,7 @@ class Blockchain:
         self.token.total_supply += amount
         
         # 分配新代币
-        self.token.balances[recipient_address] += amount
+        self.token.balances[recipient_address] = self.token.balance_of(recipient_address) + amount
         
         # 创建铸造记录
         mint_record = {
@@ -562,13 +889,13 @@ class Blockchain:
             "minter": admin_address,
             "recipient": recipient_address,
             "amount": amount,
-            "token": self.token.symbol,
+            "token": self._symbol,
             "new_total_supply": self.token.total_supply,
             "timestamp": time.time()
         }
         
         # 对铸造记录进行签名
-        mint_string = json.dumps(mint_record, sort_keys=True)
+        mint_string = _signing_json(mint_record)
         signature = admin_key.sign(mint_string)
         mint_record["signature"] = signature
         
@@ -577,7 +904,7 @@ class Blockchain:
         
         return {
             "success": True,
-            "message": f"成功铸造 {amount} {self.token.symbol} 给地址 {recipient_address[:10]}...",
+            "message": f"成功铸造 {amount} {self._symbol} 给地址 {recipient_address[:10]}...",
             "transaction": mint_record
         }
     
@@ -602,7 +929,7 @@ class Blockchain:
         }
         
         # 对交易进行签名
-        transaction_string = json.dumps(transaction, sort_keys=True)
+        transaction_string = _signing_json(transaction)
         signature = key_pair.sign(transaction_string)
         transaction["signature"] = signature
         transaction["public_key"] = key_pair.public_key
@@ -645,12 +972,24 @@ class Blockchain:
         
         # 添加区块到链上
         self.chain.append(new_block)
+        self._by_hash[new_block.hash] = new_block.index
         
         # 清空待处理交易列表
         self.pending_transactions = []
         
         return new_block
     
+    @property
+    def difficulty(self) -> int:
+        """挖矿难度（哈希前导零的个数）"""
+        return self._difficulty
+    
+    @difficulty.setter
+    def difficulty(self, value: int) -> None:
+        # 同时更新整数形式的工作量证明目标，验证时直接与原始摘要比较
+        self._difficulty = value
+        self._target_int = _pow_target(value)
+    
     def register_node(self, address: str) -> None:
         """
         将新节点添加到节点列表
@@ -660,26 +999,54 @@ class Blockchain:
         """
         self.nodes.add(address)
     
-    def is_chain_valid(self) -> bool:
-        """验证区块链的完整性"""
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i-1]
-            
-            # 检查当前区块的哈希是否正确
-            if current_block.hash != current_block._calculate_hash():
-                print(f"区块 {i} 的哈希无效")
-                return False
+    @staticmethod
+    def _batch_block_hashes(blocks: List[Block]) -> List[bytes]:
+        """
+        批量重算一组区块的哈希
+        
+        每个区块的哈希只依赖自身字段，整批一次算完，验证时再与链接、工作量证明一起单遍比较
+        
+        Args:
+            blocks: 区块列表
             
-            # 检查区块链接是否正确
-            if current_block.previous_hash != previous_block.hash:
-                print(f"区块 {i} 与前一个区块的链接无效")
-                return False
+        Returns:
+            与区块一一对应的原始摘要列表
+        """
+        return _batch_hash([block._canonical_bytes() for block in blocks])
+    
+    def _find_invalid_block(self, chain: List[Block]) -> Optional[Tuple[int, str]]:
+        """
+        单遍检查区块链，返回第一个无效区块
+        
+        Args:
+            chain: 待检查的区块列表
             
-            # 验证工作量证明
-            if current_block.hash[:self.difficulty] != '0' * self.difficulty:
-                print(f"区块 {i} 未满足工作量证明要求")
-                return False
+        Returns:
+            (区块索引, 原因)，全部有效时返回None
+        """
+        target = self._target_int
+        from_bytes = int.from_bytes
+        expected = self._batch_block_hashes(chain[1:])
+        # 每个区块的哈希只读取一次，下一轮直接作为前一个哈希比较
+        prev_hash = chain[0].hash if chain else None
+        for i, digest in enumerate(expected, 1):
+            current_block = chain[i]
+            current_hash = current_block.hash
+            if current_hash != digest.hex():
+                return i, "的哈希无效"
+            if current_block.previous_hash != prev_hash:
+                return i, "与前一个区块的链接无效"
+            if from_bytes(digest, 'big') >= target:
+                return i, "未满足工作量证明要求"
+            prev_hash = current_hash
+        return None
+    
+    def is_chain_valid(self) -> bool:
+        """验证区块链的完整性"""
+        invalid = self._find_invalid_block(self.chain)
+        if invalid:
+            print(f"区块 {invalid[0]} {invalid[1]}")
+            return False
         
         return True
     
@@ -710,31 +1077,21 @@ class Blockchain:
                         data=block_data["data"],
                         previous_hash=block_data["previous_hash"],
                         signature=block_data["signature"],
-                        nonce=block_data["nonce"]
+                        nonce=block_data["nonce"],
+                        hash=block_data["hash"]
                     )
-                    block.hash = block_data["hash"]
                     chain.append(block)
                 
                 # 检查这个链是否有效
-                valid = True
-                for i in range(1, len(chain)):
-                    if chain[i].previous_hash != chain[i-1].hash:
-                        valid = False
-                        break
-                    if chain[i].hash != chain[i]._calculate_hash():
-                        valid = False
-                        break
-                    if chain[i].hash[:self.difficulty] != '0' * self.difficulty:
-                        valid = False
-                        break
-                
-                if valid:
+                if self._find_invalid_block(chain) is None:
                     max_length = length
                     new_chain = chain
         
         # 如果找到了更长的有效链，则替换当前链
         if new_chain:
             self.chain = new_chain
+            self._rebuild_hash_index()
+            self._cache_genesis_info()
             return True
         
         return False
@@ -750,13 +1107,9 @@ class Blockchain:
         Returns:
             代币信息字典
         """
-        return {
-            "name": self.token.name,
-            "symbol": self.token.symbol,
-            "total_supply": self.token.total_supply,
-            "decimals": self.token.decimals,
-            "creator": self.chain[0].data.get("creator_address", "未知")
-        }
+        info = dict(self._token_info)
+        info["total_supply"] = self.token.total_supply
+        return info
     
     def get_all_balances(self) -> Dict[str, int]:
         """
@@ -771,16 +1124,20 @@ class Blockchain:
         """
         将区块链保存到文件
         
+        逐个区块用orjson编码后写入，不先构造整条链的字典列表
+        
         Args:
             filename: 保存的文件名
         """
-        data = {
-            "chain": self.get_chain_data(),
-            "token": self.token.to_dict()
-        }
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        with open(filename, 'wb') as f:
+            f.write(b'{"chain":[')
+            for i, block in enumerate(self.chain):
+                if i:
+                    f.write(b',')
+                f.write(orjson.dumps(block.to_dict(), option=_SAVE_OPTIONS))
+            f.write(b'],"token":')
+            f.write(orjson.dumps(self.token.to_dict(), option=_SAVE_OPTIONS))
+            f.write(b'}')
         print(f"区块链已保存到文件: {filename}")
     
     @classmethod
@@ -796,22 +1153,14 @@ class Blockchain:
             加载的区块链对象
         """
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(filename, 'rb') as f:
+                data = orjson.loads(f.read())
                 
             chain_data = data["chain"]
             token_data = data["token"]
             
-            # 创建空的区块链
-            blockchain = cls(
-                difficulty=difficulty,
-                token_name=token_data["name"],
-                token_symbol=token_data["symbol"],
-                token_supply=token_data["total_supply"]
-            )
-            
-            # 清空初始化时自动创建的链和代币
-            blockchain.chain = []
+            # 创建空的区块链（不生成、不挖掘会被丢弃的创世区块）
+            blockchain = cls._empty(difficulty)
             
             # 加载代币
             blockchain.token = Token.from_dict(token_data)
@@ -824,10 +1173,12 @@ class Blockchain:
                     data=block_data["data"],
                     previous_hash=block_data["previous_hash"],
                     signature=block_data["signature"],
-                    nonce=block_data["nonce"]
+                    nonce=block_data["nonce"],
+                    hash=block_data["hash"]
                 )
-                block.hash = block_data["hash"]
                 blockchain.chain.append(block)
+            blockchain._rebuild_hash_index()
+            blockchain._cache_genesis_info()
                 
             print(f"从文件加载了 {len(blockchain.chain)} 个区块和代币 {blockchain.token.name} ({blockchain.token.symbol})")
             return blockchain
@@ -925,7 +1276,7 @@ class BlockchainNode:
                 
             elif cmd == "show_chain":
                 chain_data = self.blockchain.get_chain_data()
-                print(json.dumps(chain_data, indent=2))
+                print(orjson.dumps(chain_data, option=_SAVE_OPTIONS | orjson.OPT_INDENT_2).decode())
                 
             elif cmd == "token_info":
                 token_info = self.blockchain.get_token_info()
@@ -1047,15 +1398,16 @@ def main():
         
         # 显示代币信息
         token_info = blockchain.get_token_info()
+        symbol = token_info['symbol']
         print(f"\n代币信息:")
         print(f"名称: {token_info['name']}")
-        print(f"符号: {token_info['symbol']}")
+        print(f"符号: {symbol}")
         print(f"总供应量: {token_info['total_supply']}")
         print(f"创建者地址: {token_info['creator'][:16]}...")
         
         # 查询创建者余额
         creator_balance = blockchain.get_token_balance(creator_address)
-        print(f"创建者余额: {creator_balance} {token_info['symbol']}")
+        print(f"创建者余额: {creator_balance} {symbol}")
         
         # 创建一个新的用户密钥对
         user_key_pair = KeyPair()
@@ -1064,7 +1416,7 @@ def main():
         
         # 转移一些代币给新用户
         transfer_amount = 1000
-        print(f"\n从创建者转移 {transfer_amount} {token_info['symbol']} 到新用户...")
+        print(f"\n从创建者转移 {transfer_amount} {symbol} 到新用户...")
         
         # 我们需要创建者的密钥对才能转移代币
         # 由于我们没有在创世块中保存创建者的私钥，这里我们为演示创建一个新的密钥对
@@ -1085,8 +1437,8 @@ def main():
         creator_balance = blockchain.get_token_balance(creator_address)
         user_balance = blockchain.get_token_balance(user_address)
         print(f"\n转账后余额:")
-        print(f"创建者: {creator_balance} {token_info['symbol']}")
-        print(f"新用户: {user_balance} {token_info['symbol']}")
+        print(f"创建者: {creator_balance} {symbol}")
+        print(f"新用户: {user_balance} {symbol}")
         
         # 保存区块链到文件
         blockchain.save_to_file("blockchain_with_token.json")
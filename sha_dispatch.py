@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SHA-256 后端选择
+导入时探测一次CPU特性，把单条哈希 single_hash 与批量哈希 batch_hash 绑定到合适的实现
+"""
+
+import hashlib
+import os
+
+try:
+    from mining_kernel import NUMBA_AVAILABLE, hash_many as _kernel_hash_many
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _cpu_flags() -> frozenset:
+    """读取CPU特性标志（Linux的/proc/cpuinfo），无法读取时返回空集"""
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    return frozenset(line.split(':', 1)[1].split())
+    except OSError:
+        pass
+    return frozenset()
+
+
+CPU_FLAGS = _cpu_flags()
+HAS_SHA_NI = 'sha_ni' in CPU_FLAGS
+HAS_AVX2 = 'avx2' in CPU_FLAGS
+HAS_AVX512 = 'avx512f' in CPU_FLAGS
+
+# 单条哈希：hashlib由OpenSSL实现，运行时自行在SHA-NI、AVX2与通用实现之间分派
+single_hash = hashlib.sha256
+
+
+def _hashlib_many(messages):
+    """逐条用hashlib计算摘要"""
+    return [single_hash(m).digest() for m in messages]
+
+
+# 批量哈希：多核且没有SHA-NI时使用Numba内核按消息并行（AVX2/AVX-512由LLVM按本机指令集生成）；
+# 有SHA-NI时单核OpenSSL的单条延迟已低于内核，逐条计算即可
+if NUMBA_AVAILABLE and (os.cpu_count() or 1) > 1 and not HAS_SHA_NI:
+    batch_hash = _kernel_hash_many
+    BATCH_BACKEND = 'numba'
+else:
+    batch_hash = _hashlib_many
+    BATCH_BACKEND = 'hashlib'
@@ -6,80 +6,227 @@
 用于展示量子区块链的结构和量子特性
 """
 
+import hashlib
 import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+import matplotlib
+# 所有图像都直接保存为PNG，使用非交互的Agg后端，不加载GUI工具包
+matplotlib.use("Agg", force=True)
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.colors import LinearSegmentedColormap
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import Aer  # 更新导入方式
-from qiskit.visualization import plot_histogram, plot_bloch_multivector
-
+from matplotlib.figure import Figure
+from matplotlib.collections import PatchCollection
+from matplotlib.patches import Rectangle
 # 导入我们的量子区块链实现
 from quantum_blockchain import QuantumBlockchain, QuantumRandom, QuantumHash
 
-def visualize_quantum_signature(quantum_signature: str):
+# 折线路径简化与分块绘制，降低栅格化开销
+plt.rcParams["path.simplify"] = True
+plt.rcParams["path.simplify_threshold"] = 1.0
+plt.rcParams["agg.path.chunksize"] = 10000
+
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
+
+@lru_cache(maxsize=1)
+def _qiskit() -> SimpleNamespace:
     """
-    可视化量子签名的位模式
+    首次需要量子电路时才导入Qiskit（只绘制签名或区块链结构时不加载）
+    
+    Returns:
+        包含 QuantumCircuit、transpile、Aer、plot_bloch_multivector 的命名空间
+    """
+    from qiskit import QuantumCircuit, transpile
+    from qiskit_aer import Aer  # 更新导入方式
+    from qiskit.visualization import plot_bloch_multivector
+    return SimpleNamespace(QuantumCircuit=QuantumCircuit, transpile=transpile, Aer=Aer,
+                           plot_bloch_multivector=plot_bloch_multivector)
+
+@lru_cache(maxsize=4)
+def _backend(name: str):
+    """按名称获取Aer模拟器后端，每种后端只构造一次，各函数共享"""
+    return _qiskit().Aer.get_backend(name)
+
+# 本模块源码与matplotlib版本的摘要：绘制代码或绘图库变化后缓存的PNG一律失效
+with open(__file__, 'rb') as _source:
+    _CODE_TAG = hashlib.sha256(_source.read() + matplotlib.__version__.encode()).hexdigest()
+
+def cache_png(*filenames: str, key_fn):
+    """
+    可视化结果缓存装饰器：输出PNG均已存在且输入键未变时直接跳过绘制
+    
+    只用于输出完全由参数决定的绘图（量子签名、区块链结构）；输入键与代码标签的哈希
+    保存在第一个PNG旁的 .key.json 文件中（已加入.gitignore）
     
     Args:
-        quantum_signature: 二进制格式的量子签名
+        filenames: 被装饰函数生成的PNG文件名
+        key_fn: 由函数参数计算输入键（需可repr）
     """
-    # 将二进制字符串转换为整数数组
-    if len(quantum_signature) > 64:  # 限制大小以便于可视化
-        quantum_signature = quantum_signature[:64]
-    
-    bits = np.array([int(bit) for bit in quantum_signature])
-    
-    # 创建图形
-    plt.figure(figsize=(12, 4))
-    plt.imshow(bits.reshape(1, -1), cmap='binary', aspect='auto')
-    plt.title('量子签名位模式可视化')
-    plt.xlabel('位索引')
-    plt.yticks([])
-    plt.colorbar(label='位值 (0/1)')
-    plt.tight_layout()
-    plt.savefig('quantum_signature_pattern.png')
-    plt.close()
-    print("量子签名位模式已保存为 'quantum_signature_pattern.png'")
+    sidecar = filenames[0] + '.key.json'
+    
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, _CODE_TAG, key_fn(*args, **kwargs))
+            digest = hashlib.sha256(repr(key).encode()).hexdigest()
+            if all(os.path.exists(name) for name in filenames):
+                try:
+                    with open(sidecar, 'r') as f:
+                        cached = json.load(f).get('key')
+                except (OSError, ValueError):
+                    cached = None
+                if cached == digest:
+                    print(f"{', '.join(filenames)} 已是最新，跳过绘制")
+                    return None
+            result = func(*args, **kwargs)
+            with open(sidecar, 'w') as f:
+                json.dump({'key': digest}, f)
+            return result
+        return wrapper
+    return decorator
 
-def visualize_quantum_circuit():
-    """可视化用于生成量子随机数的量子电路"""
-    # 创建一个8量子比特的示例电路
-    qc = QuantumCircuit(8, 8)
+# 区块结构图中每个区块的标签模板（字段来自get_chain_data）
+_BLOCK_LABEL = "区块 #{index}\n哈希: {hash_short}...\n前一个哈希: {prev_short}..."
+
+# 可视化函数共用的图形，每个线程一个：首次使用时创建，之后只清空内容并调整尺寸。
+# 直接构造Figure而不经过pyplot，不注册到pyplot的全局图形管理器，可在线程中独立使用
+_FIGURES = threading.local()
+
+def _get_figure(width: float, height: float) -> Figure:
+    """
+    获取当前线程共用的图形并清空其内容
+    
+    Args:
+        width: 图形宽度（英寸）
+        height: 图形高度（英寸）
+        
+    Returns:
+        已清空并调整为指定尺寸的matplotlib图形
+    """
+    fig = getattr(_FIGURES, 'fig', None)
+    if fig is None:
+        fig = _FIGURES.fig = Figure(figsize=(width, height))
+    else:
+        fig.clear()
+        fig.set_size_inches(width, height)
+    return fig
+
+def _build_random_circuit(num_qubits: int) -> 'QuantumCircuit':
+    """生成量子随机数用的电路：哈达玛门、CNOT链、再一层哈达玛门后测量"""
+    qc = _qiskit().QuantumCircuit(num_qubits, num_qubits)
     
     # 添加门
-    for i in range(8):
+    for i in range(num_qubits):
         qc.h(i)  # 哈达玛门（创建叠加）
     
     # 添加纠缠
-    for i in range(7):
+    for i in range(num_qubits - 1):
         qc.cx(i, i+1)  # CNOT门（创建纠缠）
     
     # 再次添加哈达玛门
-    for i in range(8):
+    for i in range(num_qubits):
         qc.h(i)
     
     # 测量
-    qc.measure(range(8), range(8))
+    qc.measure(range(num_qubits), range(num_qubits))
+    return qc
+
+def _build_entangled_circuit(num_qubits: int) -> 'QuantumCircuit':
+    """叠加与纠缠演示电路：第一个量子比特置于叠加态后依次纠缠其余量子比特"""
+    qc = _qiskit().QuantumCircuit(num_qubits)
+    qc.h(0)  # 将第一个量子比特置于叠加态
+    for i in range(num_qubits - 1):
+        qc.cx(i, i+1)  # 纠缠相邻量子比特
+    return qc
+
+def _build_random_state_circuit(num_qubits: int) -> 'QuantumCircuit':
+    """去掉末尾测量的随机数电路，用于直接求态向量"""
+    return _build_random_circuit(num_qubits).remove_final_measurements(inplace=False)
+
+_CIRCUIT_BUILDERS = {
+    'random': _build_random_circuit,
+    'random_state': _build_random_state_circuit,
+    'entangled': _build_entangled_circuit,
+}
+
+@lru_cache(maxsize=8)
+def _get_compiled(circuit_name: str, num_qubits: int, backend_name: str):
+    """
+    构建并编译电路，按 (电路, 量子比特数, 后端) 缓存，重复可视化时跳过transpile
+    
+    Returns:
+        (后端, 原始电路, 编译后的电路)
+    """
+    qiskit = _qiskit()
+    qc = _CIRCUIT_BUILDERS[circuit_name](num_qubits)
+    backend = _backend(backend_name)
+    return backend, qc, qiskit.transpile(qc, backend, optimization_level=1)
+
+@cache_png('quantum_signature_pattern.png', key_fn=lambda quantum_signature: quantum_signature[:64])
+def visualize_quantum_signature(quantum_signature: str):
+    """
+    可视化量子签名的位模式
+    
+    Args:
+        quantum_signature: 二进制格式的量子签名
+    """
+    # 只切片一次：限制为最多64位以便于可视化，再一次性把'0'/'1'字符转换为0/1数组
+    bits = np.frombuffer(quantum_signature[:64].encode('ascii'), dtype=np.uint8) - ord('0')
+    
+    # 复用共用图形
+    fig = _get_figure(12, 4)
+    ax = fig.add_subplot(111)
+    image = ax.imshow(bits.reshape(1, -1), cmap='binary', aspect='auto')
+    ax.set_title('量子签名位模式可视化')
+    ax.set_xlabel('位索引')
+    ax.set_yticks([])
+    fig.colorbar(image, ax=ax, label='位值 (0/1)')
+    fig.tight_layout()
+    fig.savefig('quantum_signature_pattern.png')
+    print("量子签名位模式已保存为 'quantum_signature_pattern.png'")
+
+def visualize_quantum_circuit():
+    """可视化用于生成量子随机数的量子电路"""
+    num_qubits = 8
+    shots = 1024
+    
+    # 8量子比特的示例电路（绘图用带测量的电路）
+    qc = _build_random_circuit(num_qubits)
     
     # 绘制电路
     circuit_diagram = qc.draw(output='mpl', filename='quantum_circuit.png')
-    plt.close()  # 关闭自动显示的图形
+    plt.close(circuit_diagram)  # 关闭电路图自身的图形
     print("量子电路图已保存为 'quantum_circuit.png'")
     
-    # 模拟电路并可视化结果分布
-    simulator = Aer.get_backend('qasm_simulator')
-    qc_compiled = transpile(qc, simulator)
-    job = simulator.run(qc_compiled, shots=1024)
-    result = job.result()
-    counts = result.get_counts(qc)
+    # 结果分布由态向量直接算出：一次态向量模拟代替逐次采样（构建与编译结果已缓存）
+    simulator, _, state_compiled = _get_compiled('random_state', num_qubits, 'statevector_simulator')
+    statevector = simulator.run(state_compiled).result().get_statevector()
+    probs = np.abs(np.asarray(statevector)) ** 2
+    counts = {format(i, f'0{num_qubits}b'): int(round(p * shots))
+              for i, p in enumerate(probs) if p > 1e-9}
     
-    # 保存结果分布图
-    plot_histogram(counts, filename='quantum_measurement_distribution.png', 
-                  title='量子测量结果分布', figsize=(12, 6))
-    plt.close()
+    # 保存结果分布图：直接绘制柱状图，不经过qiskit的plot_histogram
+    keys = sorted(counts)
+    values = np.fromiter((counts[key] for key in keys), dtype=np.int32, count=len(keys))
+    fig = _get_figure(12, 6)
+    ax = fig.add_subplot(111)
+    positions = np.arange(len(keys))
+    ax.bar(positions, values)
+    ax.set_xticks(positions)
+    ax.set_xticklabels(keys, rotation=70, fontsize=6)
+    ax.set_ylabel('计数')
+    ax.set_title('量子测量结果分布')
+    fig.savefig('quantum_measurement_distribution.png')
     print("量子测量结果分布已保存为 'quantum_measurement_distribution.png'")
 
+@cache_png('blockchain_structure.png',
+           key_fn=lambda blockchain: tuple(block.hash for block in blockchain.chain))
 def visualize_blockchain_structure(blockchain):
     """
     可视化区块链结构
@@ -94,30 +241,30 @@ def visualize_blockchain_structure(blockchain):
         print("区块链为空，无法可视化")
         return
     
-    # 创建图形
-    fig, ax = plt.subplots(figsize=(12, num_blocks * 2))
+    # 复用共用图形，高度随区块数量变化
+    fig = _get_figure(12, num_blocks * 2)
+    ax = fig.add_subplot(111)
     
     # 自定义颜色映射
     colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
     
-    # 为每个区块绘制一个矩形框
+    # 所有区块矩形合并为一个PatchCollection
+    rects = [Rectangle((0.1, i*1.5), 0.8, 1.0) for i in range(num_blocks)]
+    facecolors = [colors[i % len(colors)] for i in range(num_blocks)]
+    ax.add_collection(PatchCollection(rects, facecolors=facecolors,
+                                      alpha=0.7, edgecolor='black'))
+    
+    # 显示区块信息（文本仍需逐个绘制）
     for i, block in enumerate(chain_data):
-        # 区块位置和大小
-        rect = plt.Rectangle((0.1, i*1.5), 0.8, 1.0, facecolor=colors[i % len(colors)], 
-                            alpha=0.7, edgecolor='black')
-        ax.add_patch(rect)
-        
-        # 显示区块信息
-        ax.text(0.5, i*1.5 + 0.5, 
-               f"区块 #{block['index']}\n"
-               f"哈希: {block['hash'][:8]}...\n"
-               f"前一个哈希: {block['previous_hash'][:8]}...",
+        ax.text(0.5, i*1.5 + 0.5, _BLOCK_LABEL.format_map(block),
                ha='center', va='center', color='white', fontweight='bold')
-        
-        # 如果不是创世区块，绘制连接线
-        if i > 0:
-            ax.annotate('', xy=(0.5, i*1.5), xytext=(0.5, (i-1)*1.5 + 1.0),
-                       arrowprops=dict(arrowstyle='->', color='black', lw=2))
+    
+    # 相邻区块之间的连接箭头用一次quiver绘制：从区块i顶部指向区块i+1底部
+    if num_blocks > 1:
+        num_links = num_blocks - 1
+        ax.quiver(np.full(num_links, 0.5), np.arange(num_links) * 1.5 + 1.0,
+                  np.zeros(num_links), np.full(num_links, 0.5),
+                  angles='xy', scale_units='xy', scale=1, color='black', width=0.02)
     
     # 设置绘图区域
     ax.set_xlim(0, 1)
@@ -126,27 +273,22 @@ def visualize_blockchain_structure(blockchain):
     ax.set_aspect('equal')
     ax.set_axis_off()
     
-    plt.tight_layout()
-    plt.savefig('blockchain_structure.png')
-    plt.close()
+    # 不做tight_layout重新排版，保存时一次性裁剪边距；区块多时图像很高，降低DPI
+    fig.savefig('blockchain_structure.png', dpi=90, bbox_inches='tight')
     print("区块链结构已保存为 'blockchain_structure.png'")
 
 def visualize_quantum_state():
     """可视化量子状态的叠加和纠缠特性"""
-    # 创建处于叠加态的两量子比特电路
-    qc = QuantumCircuit(2)
-    qc.h(0)  # 将第一个量子比特置于叠加态
-    qc.cx(0, 1)  # 纠缠两个量子比特
+    # 处于叠加态并纠缠的两量子比特电路（构建与编译结果已缓存）
+    simulator, qc, qc_compiled = _get_compiled('entangled', 2, 'statevector_simulator')
     
     # 获取量子态向量
-    simulator = Aer.get_backend('statevector_simulator')
-    qc_compiled = transpile(qc, simulator)
     job = simulator.run(qc_compiled)
     result = job.result()
     statevector = result.get_statevector()
     
     # 绘制量子态的Bloch球表示
-    bloch_fig = plot_bloch_multivector(statevector, filename='quantum_bloch_sphere.png')
+    bloch_fig = _qiskit().plot_bloch_multivector(statevector, filename='quantum_bloch_sphere.png')
     plt.close()
     print("量子状态的Bloch球表示已保存为 'quantum_bloch_sphere.png'")
 
@@ -163,17 +305,23 @@ def main():
     
     print("\n开始可视化量子区块链特性...")
     
-    # 可视化创世区块的量子签名
-    genesis_block = blockchain.chain[0]
-    visualize_quantum_signature(genesis_block.quantum_signature)
+    # 工作线程只做数据准备（导入Qiskit、构建并transpile电路，结果进入_get_compiled的缓存）；
+    # pyplot的全局图形管理器不是线程安全的，所有绘图（包括qiskit的绘图函数）都留在主线程
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        compiled = [
+            executor.submit(_get_compiled, 'random_state', 8, 'statevector_simulator'),
+            executor.submit(_get_compiled, 'entangled', 2, 'statevector_simulator'),
+        ]
+        
+        # 量子签名与区块链结构不需要Qiskit，编译进行的同时在主线程绘制
+        genesis_block = blockchain.chain[0]
+        visualize_quantum_signature(genesis_block.quantum_signature)
+        visualize_blockchain_structure(blockchain)
+        
+        for future in compiled:
+            future.result()
     
-    # 可视化量子电路
     visualize_quantum_circuit()
-    
-    # 可视化区块链结构
-    visualize_blockchain_structure(blockchain)
-    
-    # 可视化量子状态
     visualize_quantum_state()
     
     print("\n可视化完成！所有图像已保存。")